@@ -0,0 +1,52 @@
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import event, inspect
+
+from application.models import User
+from core.config import AUTH_CACHE_SIZE, AUTH_CACHE_TTL
+from core.metrics import CACHE_REQUESTS
+from core.ttl_cache import TTLCache
+
+
+@dataclass(frozen=True, slots=True)
+class AuthUser:
+
+    id: int
+    name: str
+    api_key: str
+    role: str
+
+
+# api_key -> пользователь; в каждом воркере свой кэш, устаревание ограничено TTL
+auth_cache: TTLCache[str, AuthUser] = TTLCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL)
+
+
+def cache_user(user: User):
+
+    auth_cache.set(user.api_key, AuthUser(user.id, user.name, user.api_key, user.role))
+
+
+def cached_user(api_key: str) -> Optional[User]:
+    """Detached `User` built from the cache, or None on a miss."""
+
+    record = auth_cache.get(api_key)
+    if record is None:
+        CACHE_REQUESTS.labels("auth", "miss").inc()
+        return None
+
+    CACHE_REQUESTS.labels("auth", "hit").inc()
+
+    return User(
+        id=record.id, name=record.name, api_key=record.api_key, role=record.role
+    )
+
+
+@event.listens_for(User, "after_insert")
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def invalidate_user(mapper, connection, target: User):
+
+    auth_cache.invalidate(target.api_key)
+    for old_key in inspect(target).attrs.api_key.history.deleted:
+        auth_cache.invalidate(old_key)
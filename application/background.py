@@ -0,0 +1,20 @@
+from functools import partial
+
+from anyio import to_thread
+from loguru import logger
+
+
+async def send_task(task_name: str, *args: int):
+    """Hand work to the Celery worker, off the request path."""
+
+    # celery импортируется при первой отправке, а не при старте воркера API
+    from core.celery_app import app as celery_app
+
+    try:
+        await to_thread.run_sync(
+            partial(celery_app.send_task, f"application.tasks.{task_name}", args=args)
+        )
+    except Exception as e:  # noqa
+        # Запрос из-за брокера не роняем, Celery уже повторил отправку. Потерянную
+        # раздачу твита полная лента сама не догонит: остается только этот лог
+        logger.error("Unable to enqueue {}{}: {}", task_name, args, e)
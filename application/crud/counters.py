@@ -0,0 +1,44 @@
+from typing import cast
+
+from loguru import logger
+from sqlalchemy import CursorResult, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from application.models import FollowLink, Likes, Tweet, User
+
+
+async def reconcile_counters(session: AsyncSession) -> int:
+    """Recount the denormalized counters and fix the rows that drifted."""
+
+    likes = select(func.count()).where(Likes.tweet_id == Tweet.id).scalar_subquery()
+    followers = (
+        select(func.count()).where(FollowLink.followed_id == User.id).scalar_subquery()
+    )
+    following = (
+        select(func.count()).where(FollowLink.follower_id == User.id).scalar_subquery()
+    )
+
+    tweets = await session.execute(
+        update(Tweet)
+        .where(Tweet.likes_count != likes)
+        .values(likes_count=likes)
+        .execution_options(synchronize_session=False)
+    )
+    users = await session.execute(
+        update(User)
+        .where(
+            or_(User.followers_count != followers, User.following_count != following)
+        )
+        .values(followers_count=followers, following_count=following)
+        .execution_options(synchronize_session=False)
+    )
+    await session.commit()
+
+    tweets_fixed = cast(CursorResult, tweets).rowcount
+    users_fixed = cast(CursorResult, users).rowcount
+    if tweets_fixed or users_fixed:
+        logger.warning(
+            "Counters drift repaired: {} tweets, {} users", tweets_fixed, users_fixed
+        )
+
+    return tweets_fixed + users_fixed
@@ -1,14 +1,33 @@
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from application import response_cache, timeline
 from application.models import FollowLink, User
 
 
+async def change_follow_counts(
+    session: AsyncSession, follower_id: int, followed_id: int, delta: int
+):
+
+    await session.execute(
+        update(User)
+        .where(User.id == follower_id)
+        .values(following_count=User.following_count + delta)
+    )
+    await session.execute(
+        update(User)
+        .where(User.id == followed_id)
+        .values(followers_count=User.followers_count + delta)
+    )
+
+
 async def create_follow(session: AsyncSession, user: User, user_id: int):
     new_subscription = FollowLink(follower_id=user.id, followed_id=user_id)
     session.add(new_subscription)
     try:
+        await session.flush()
+        await change_follow_counts(session, user.id, user_id, 1)
         await session.commit()
 
     except IntegrityError:
@@ -16,6 +35,9 @@ async def create_follow(session: AsyncSession, user: User, user_id: int):
 
         raise
 
+    await timeline.enqueue("backfill_follow", user.id, user_id)
+    await response_cache.invalidate_follow(user.id, user_id)
+
 
 async def get_follow(
     session: AsyncSession, user: User, user_id: int
@@ -31,6 +53,12 @@ async def get_follow(
 
 async def del_follow(session: AsyncSession, follow: FollowLink):
 
+    follower_id, followed_id = follow.follower_id, follow.followed_id
     await session.delete(follow)
+    await session.flush()
+    await change_follow_counts(session, follower_id, followed_id, -1)
 
     await session.commit()
+
+    await timeline.enqueue("retract_follow", follower_id, followed_id)
+    await response_cache.invalidate_follow(follower_id, followed_id)
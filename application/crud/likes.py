@@ -1,8 +1,18 @@
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.exc import IntegrityError, MissingGreenlet
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from application.models import Likes, User
+from application import response_cache
+from application.models import Likes, Tweet, User
+
+
+async def change_likes_count(session: AsyncSession, tweet_id: int, delta: int):
+
+    await session.execute(
+        update(Tweet)
+        .where(Tweet.id == tweet_id)
+        .values(likes_count=Tweet.likes_count + delta)
+    )
 
 
 async def create_like(session: AsyncSession, user: User, tweet_id: int):
@@ -11,12 +21,16 @@ async def create_like(session: AsyncSession, user: User, tweet_id: int):
     session.add(new_like)
 
     try:
+        await session.flush()
+        await change_likes_count(session, tweet_id, 1)
         await session.commit()
 
     except (IntegrityError, MissingGreenlet):
         await session.rollback()
         raise
 
+    await response_cache.invalidate_tweet_feeds(session, tweet_id)
+
 
 async def get_like(session: AsyncSession, user: User, tweet_id: int) -> Likes | None:
 
@@ -31,9 +45,13 @@ async def del_like(session: AsyncSession, like: Likes):
     await session.delete(like)
 
     try:
+        await session.flush()
+        await change_likes_count(session, like.tweet_id, -1)
         await session.commit()
 
     except IntegrityError:
         await session.rollback()
 
         raise
+
+    await response_cache.invalidate_tweet_feeds(session, like.tweet_id)
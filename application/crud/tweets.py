@@ -1,13 +1,32 @@
-from typing import Optional
+import asyncio
+from hashlib import blake2b
+from typing import Any, Optional, Sequence, cast
 
 from loguru import logger
-from sqlalchemy import select, update
+from sqlalchemy import (
+    JSON,
+    BigInteger,
+    Result,
+    Table,
+    bindparam,
+    func,
+    insert,
+    literal,
+    null,
+    select,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, aggregate_order_by
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import aliased, selectinload
 
-from application.models import FollowLink, Media, Tweet, User
+from application import response_cache, timeline
+from application.media import StoredFile, publish, unlink_files
+from application.models import FollowLink, Likes, Media, Tweet, User
 from application.schemas import AddTweet
+from application.serializers import FeedRow
+from application.thumbnails import generate_variants, with_variants
 
 
 async def created_tweet(
@@ -29,15 +48,50 @@ async def created_tweet(
             logger.info("Added media. User: {}", user.name)
 
         await session.commit()
-        return new_tweet
 
+    await timeline.enqueue("fan_out_tweet", new_tweet.id, user.id)
+    await response_cache.invalidate_author_feeds(user.id)
+    return new_tweet
 
-async def save_media(session: AsyncSession, media: Media):
+
+def path_lock_key(path: str) -> int:
+
+    return int.from_bytes(blake2b(path.encode(), digest_size=8).digest(), signed=True)
+
+
+async def lock_paths(session: AsyncSession, paths: Sequence[str]):
+    """Advisory locks on media paths until the end of the transaction."""
+
+    # Один запрос; сортировка ключей исключает взаимную блокировку
+    keys = sorted({path_lock_key(path) for path in paths})
+    if not keys:
+        return
+    key = func.unnest(literal(keys, ARRAY(BigInteger))).column_valued("key")
+    await session.execute(select(func.pg_advisory_xact_lock(key)))
+
+
+async def save_media(session: AsyncSession, media: Media, stored: StoredFile):
 
     async with session.begin_nested() if session.in_transaction() else session.begin():
+        await lock_paths(session, [str(stored.path)])
+        await publish([stored])
         session.add(media)
 
 
+async def save_media_batch(
+    session: AsyncSession, media: Sequence[dict[str, Any]], stored: Sequence[StoredFile]
+) -> list[int]:
+    """Insert all rows with one INSERT ... RETURNING, ids in input order."""
+
+    async with session.begin_nested() if session.in_transaction() else session.begin():
+        await lock_paths(session, [str(file.path) for file in stored])
+        await publish(stored)
+        result = await session.execute(
+            insert(Media).returning(Media.id, sort_by_parameter_order=True), media
+        )
+        return list(result.scalars().all())
+
+
 async def get_tweet(
     session: AsyncSession, tweet_id: int, user: User
 ) -> Optional[Tweet]:
@@ -52,6 +106,67 @@ async def get_tweet(
     return result_tweet.scalars().first()
 
 
+async def unreferenced_paths(session: AsyncSession, tweet: Tweet) -> list[str]:
+    """Attachment files of `tweet` that no other media row refers to."""
+
+    paths = {media.path for media in tweet.tweet_media_ids}
+    if not paths:
+        return []
+
+    query = (
+        select(Media.path)
+        .where(Media.path.in_(paths), Media.tweet_id.is_distinct_from(tweet.id))
+        .distinct()
+    )
+    result = await session.execute(query)
+
+    return sorted(paths - set(result.scalars().all()))
+
+
+async def unused_paths(session: AsyncSession, paths: Sequence[str]) -> list[str]:
+    """Files among `paths` that no media row refers to."""
+
+    if not paths:
+        return []
+
+    result = await session.execute(
+        select(Media.path).where(Media.path.in_(paths)).distinct()
+    )
+
+    return sorted(set(paths) - set(result.scalars().all()))
+
+
+async def remove_unused_files(session: AsyncSession, paths: Sequence[str]):
+    """Unlink files of `paths` that still have no rows, under the path locks."""
+
+    # Блокировка не дает загрузке тех же байтов занять путь между проверкой
+    # и удалением
+
+    async with session.begin_nested() if session.in_transaction() else session.begin():
+        await lock_paths(session, paths)
+        unused = await unused_paths(session, paths)
+        await unlink_files(with_variants(unused))
+
+
+async def make_variants(session: AsyncSession, paths: Sequence[str]):
+    """Render the variants of uploaded images and record their sizes."""
+
+    rendered = await asyncio.gather(*(generate_variants(path) for path in paths))
+    # Core-таблица: ORM-вариант executemany обновляет только по первичному ключу
+    media = cast(Table, Media.__table__)
+    # Все записи одного файла (MEDIA_STORAGE=content) получают те же копии
+    async with session.begin_nested() if session.in_transaction() else session.begin():
+        await session.execute(
+            update(media)
+            .where(media.c.path == bindparam("media_path"))
+            .values(variants=bindparam("sizes")),
+            [
+                {"media_path": path, "sizes": sizes}
+                for path, sizes in zip(paths, rendered)
+            ],
+        )
+
+
 async def get_tweet_by_id(session: AsyncSession, tweet_id: int) -> Tweet | None:
 
     return await session.get(Tweet, tweet_id)
@@ -59,6 +174,7 @@ async def get_tweet_by_id(session: AsyncSession, tweet_id: int) -> Tweet | None:
 
 async def del_tweet(session: AsyncSession, tweet: Tweet):
 
+    tweet_id, author_id = tweet.id, tweet.user_id
     try:
         await session.delete(tweet)
         await session.commit()
@@ -68,26 +184,166 @@ async def del_tweet(session: AsyncSession, tweet: Tweet):
         logger.error("DB IntegrityError during tweet deletion")
         raise
 
+    await timeline.enqueue("retract_tweet", tweet_id, author_id)
+    await response_cache.invalidate_author_feeds(author_id)
 
-async def get_tweets_all(session: AsyncSession, user: User):
 
-    stmt = (
-        select(Tweet)
-        .options(
-            selectinload(Tweet.author),
-            selectinload(Tweet.tweet_media_ids),
-            selectinload(Tweet.likes),
+def followed_ids(user_id: int):
+
+    return select(FollowLink.followed_id).where(FollowLink.follower_id == user_id)
+
+
+async def pulled_tweet_ids(
+    session: AsyncSession, authors, limit: int, before_id: Optional[int]
+) -> list[int]:
+
+    query = (
+        select(Tweet.id)
+        .where(Tweet.user_id.in_(authors))
+        .order_by(Tweet.id.desc())
+        .limit(limit)
+    )
+    if before_id is not None:
+        query = query.where(Tweet.id < before_id)
+
+    result = await session.execute(query)
+
+    return list(result.scalars().all())
+
+
+async def timeline_tweet_ids(
+    session: AsyncSession,
+    backend: timeline.TimelineBackend,
+    user: User,
+    limit: int,
+    before_id: Optional[int],
+) -> list[int]:
+    """Merge the materialized timeline with tweets of pull-mode authors."""
+
+    materialized = await backend.range(session, user.id, limit, before_id)
+    ids = set(materialized)
+
+    celebrities = (
+        select(FollowLink.followed_id)
+        .join(User, User.id == FollowLink.followed_id)
+        .where(FollowLink.follower_id == user.id, User.is_celebrity.is_(True))
+    )
+    ids.update(await pulled_tweet_ids(session, celebrities, limit, before_id))
+
+    # Материализованная лента кончилась (обрезана или заполнена позже подписок):
+    # более старые твиты добираются по подпискам
+    if len(materialized) < limit:
+        oldest = min(materialized) if materialized else before_id
+        ids.update(
+            await pulled_tweet_ids(session, followed_ids(user.id), limit, oldest)
         )
-        .where(
-            Tweet.user_id.in_(
-                select(FollowLink.followed_id).where(
-                    FollowLink.follower_id
-                    == (select(User.id).where(User.id == user.id).scalar_subquery())
-                )
+
+    return sorted(ids, reverse=True)[:limit]
+
+
+def feed_statement(with_likes: bool):
+    """One row per tweet, attachments and likers aggregated in subqueries."""
+
+    attachments = (
+        select(func.array_agg(aggregate_order_by(Media.path, Media.id)))
+        .where(Media.tweet_id == Tweet.id)
+        .scalar_subquery()
+    )
+    attachment_variants = (
+        select(func.json_agg(aggregate_order_by(Media.variants, Media.id), type_=JSON))
+        .where(Media.tweet_id == Tweet.id)
+        .scalar_subquery()
+    )
+
+    liker = aliased(User)
+    likes = (
+        select(
+            func.json_agg(
+                aggregate_order_by(
+                    func.json_build_object("user_id", liker.id, "name", liker.name),
+                    liker.id,
+                ),
+                type_=JSON,
             )
         )
+        .select_from(Likes)
+        .join(liker, liker.id == Likes.user_id)
+        .where(Likes.tweet_id == Tweet.id)
+        .scalar_subquery()
+    )
+
+    return (
+        select(
+            Tweet.id,
+            Tweet.tweet_data,
+            User.id,
+            User.name,
+            attachments,
+            attachment_variants,
+            likes if with_likes else null(),
+            Tweet.likes_count,
+        )
+        .join(User, User.id == Tweet.user_id)
+        .order_by(Tweet.id.desc())
     )
 
-    result_query = await session.execute(stmt)
 
-    return result_query.scalars().unique().all()
+def feed_rows(result_query: Result, with_likes: bool) -> list[FeedRow]:
+
+    # Без тяжелых ORM-объектов: кортежи сразу уходят в сериализатор
+    return [
+        FeedRow(
+            tweet_id,
+            content,
+            author_id,
+            author_name,
+            attachments or [],
+            attachment_variants or [],
+            (likes or []) if with_likes else None,
+            likes_count,
+        )
+        for (
+            tweet_id,
+            content,
+            author_id,
+            author_name,
+            attachments,
+            attachment_variants,
+            likes,
+            likes_count,
+        ) in result_query.tuples()
+    ]
+
+
+async def get_tweets_all(
+    session: AsyncSession,
+    user: User,
+    limit: int,
+    before_id: Optional[int] = None,
+    with_likes: bool = True,
+) -> list[FeedRow]:
+
+    stmt = feed_statement(with_likes)
+
+    backend = timeline.get_backend()
+    if backend is None:
+        stmt = stmt.where(Tweet.user_id.in_(followed_ids(user.id))).limit(limit)
+        if before_id is not None:
+            stmt = stmt.where(Tweet.id < before_id)
+        return feed_rows(await session.execute(stmt), with_likes)
+
+    rows: list[FeedRow] = []
+    while len(rows) < limit:
+        wanted = limit - len(rows)
+        tweet_ids = await timeline_tweet_ids(session, backend, user, wanted, before_id)
+        if not tweet_ids:
+            break
+        result = await session.execute(stmt.where(Tweet.id.in_(tweet_ids)))
+        rows += feed_rows(result, with_likes)
+        # Удаленные твиты, которые retract_tweet еще не убрал из ленты,
+        # не должны укорачивать страницу: иначе пагинация оборвется
+        if len(tweet_ids) < wanted:
+            break
+        before_id = tweet_ids[-1]
+
+    return rows
@@ -1,10 +1,9 @@
-from typing import Optional
+from typing import Literal, Optional, Sequence
 
-from sqlalchemy import select
+from sqlalchemy import Row, select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
-from application.models import User
+from application.models import FollowLink, User
 
 
 async def create_user(session: AsyncSession, user: User):
@@ -24,24 +23,42 @@ async def get_user_by_api_key(session: AsyncSession, api_key: str) -> User | Non
 
 async def get_user(session: AsyncSession, user: User) -> Optional[User]:
 
-    query = (
-        select(User)
-        .where(User.id == user.id)
-        .options(selectinload(User.followers), selectinload(User.following))
-    )
+    return await get_profile(session, user.id)
+
+
+async def get_profile(session: AsyncSession, user_id: int) -> Optional[User]:
+
+    query = select(User).where(User.id == user_id)
 
     result = await session.execute(query)
 
-    return result.scalars().first()
+    return result.scalars().one_or_none()
 
 
-async def get_profile(session: AsyncSession, user_id: int) -> Optional[User]:
+async def get_follow_page(
+    session: AsyncSession,
+    user_id: int,
+    direction: Literal["followers", "following"],
+    limit: int,
+    after_id: Optional[int] = None,
+) -> Sequence[Row[tuple[int, str]]]:
+    """One keyset page of followers or followees, ordered by user id."""
+
+    if direction == "followers":
+        own_column, other_column = FollowLink.followed_id, FollowLink.follower_id
+    else:
+        own_column, other_column = FollowLink.follower_id, FollowLink.followed_id
+
     query = (
-        select(User)
-        .where(User.id == user_id)
-        .options(selectinload(User.followers), selectinload(User.following))
+        select(User.id, User.name)
+        .join(FollowLink, other_column == User.id)
+        .where(own_column == user_id)
+        .order_by(other_column)
+        .limit(limit)
     )
+    if after_id is not None:
+        query = query.where(other_column > after_id)
 
     result = await session.execute(query)
 
-    return result.scalars().one_or_none()
+    return result.all()
@@ -12,3 +12,10 @@ async def global_exception_handler(request: Request, exc: Exception):
 def setup_exception_handlers(app: FastAPI):
     # Регистрируем обработчик без декоратора
     app.add_exception_handler(Exception, global_exception_handler)
+
+
+class MediaTooLargeError(Exception):
+
+    def __init__(self, max_size: int):
+        super().__init__(f"File exceeds the {max_size} bytes limit")
+        self.max_size = max_size
@@ -0,0 +1,208 @@
+import asyncio
+import hashlib
+import os
+import pathlib
+import uuid
+from contextlib import suppress
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+import aiofiles
+import aiofiles.os
+from anyio import to_thread
+from fastapi import UploadFile
+from loguru import logger
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from application.exceptions import MediaTooLargeError
+from core.config import (
+    MEDIA_BATCH_MAX_FILES,
+    MEDIA_CHUNK_SIZE,
+    MEDIA_MAX_SIZE,
+    MEDIA_STORAGE,
+    MEDIA_UNLINK_BATCH,
+    MEDIA_UNLINK_RETRIES,
+    MEDIA_UNLINK_RETRY_DELAY,
+)
+
+# Заголовки частей и границы multipart поверх самих файлов
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+@dataclass(frozen=True)
+class StoredFile:
+
+    path: pathlib.Path
+    digest: str
+    size: int
+    # Готовый `.part`, который publish переименует в path
+    staged: pathlib.Path
+
+
+def content_path(media_dir: pathlib.Path, digest: str, suffix: str) -> pathlib.Path:
+    """Sharded location of a content-addressed file: ab/cd/abcd...<suffix>."""
+
+    return media_dir / digest[:2] / digest[2:4] / f"{digest}{suffix}"
+
+
+async def store_upload(
+    file: UploadFile,
+    media_dir: str | pathlib.Path,
+    chunk_size: Optional[int] = None,
+    max_size: Optional[int] = None,
+) -> StoredFile:
+    """Stream an upload to a hidden `.part` file, hashing it on the way."""
+
+    # Свое имя файл получает только в publish, под блокировкой пути в
+    # транзакции со вставкой записи: одинаковые загрузки делят путь
+
+    chunk_size = chunk_size or MEDIA_CHUNK_SIZE
+    max_size = max_size or MEDIA_MAX_SIZE
+    # Часть уже принята и лежит во временном файле, пропускаем только копирование;
+    # сам запрос ограничивает UploadSizeLimit
+    if file.size is not None and file.size > max_size:
+        raise MediaTooLargeError(max_size)
+
+    media_dir = pathlib.Path(media_dir)
+    suffix = pathlib.Path(file.filename or "").suffix
+    tmp_path = media_dir / f".{uuid.uuid4()}.part"
+    hasher = hashlib.sha256()
+    size = 0
+
+    try:
+        async with aiofiles.open(tmp_path, "wb") as out_file:
+            while chunk := await file.read(chunk_size):
+                size += len(chunk)
+                if size > max_size:
+                    raise MediaTooLargeError(max_size)
+                hasher.update(chunk)
+                await out_file.write(chunk)
+
+    except BaseException:
+        with suppress(FileNotFoundError):
+            await aiofiles.os.remove(tmp_path)
+        raise
+
+    if MEDIA_STORAGE == "content":
+        file_path = content_path(media_dir, hasher.hexdigest(), suffix)
+    else:
+        file_path = media_dir / f"{uuid.uuid4()}{suffix}"
+
+    return StoredFile(
+        path=file_path, digest=hasher.hexdigest(), size=size, staged=tmp_path
+    )
+
+
+async def publish(files: Sequence[StoredFile]):
+    """Rename staged uploads into place; the same bytes simply replace a file."""
+
+    for file in files:
+        await aiofiles.os.makedirs(file.path.parent, exist_ok=True)
+        await aiofiles.os.replace(file.staged, file.path)
+
+
+async def discard(files: Sequence[StoredFile]):
+
+    for file in files:
+        with suppress(FileNotFoundError):
+            await aiofiles.os.remove(file.staged)
+
+
+def unlink_batch(paths: Sequence[str]) -> list[str]:
+    """Remove files in a worker thread; return the ones that failed."""
+
+    failed = []
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            continue
+        except OSError as e:
+            logger.warning("Unable to delete {}: {}", path, e)
+            failed.append(path)
+        else:
+            logger.info("File {} deleted from disk", path)
+
+    return failed
+
+
+async def unlink_files(
+    paths: Sequence[str],
+    batch_size: Optional[int] = None,
+    retries: Optional[int] = None,
+    retry_delay: Optional[float] = None,
+):
+    """Delete files off the event loop, in batches, retrying failures."""
+
+    # Вызывается после коммита, удалившего записи; что не удалилось, подберет
+    # сборщик мусора
+
+    batch_size = batch_size or MEDIA_UNLINK_BATCH
+    retries = MEDIA_UNLINK_RETRIES if retries is None else retries
+    retry_delay = MEDIA_UNLINK_RETRY_DELAY if retry_delay is None else retry_delay
+
+    pending = list(paths)
+    for attempt in range(retries + 1):
+        if attempt:
+            await asyncio.sleep(retry_delay * 2 ** (attempt - 1))
+
+        failed = []
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start : start + batch_size]
+            failed += await to_thread.run_sync(unlink_batch, batch)
+
+        if not failed:
+            return
+        pending = failed
+
+    logger.error("Gave up deleting {} files: {}", len(pending), pending)
+
+
+def upload_limits() -> dict[str, int]:
+
+    return {
+        "/api/medias": MEDIA_MAX_SIZE + MULTIPART_OVERHEAD,
+        "/api/medias/batch": MEDIA_MAX_SIZE * MEDIA_BATCH_MAX_FILES
+        + MULTIPART_OVERHEAD,
+    }
+
+
+class UploadSizeLimit:
+    """Reject upload bodies over the limit before the form is parsed."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+
+        limit = None
+        if scope["type"] == "http" and scope["method"] == "POST":
+            limit = upload_limits().get(scope["path"])
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        detail = str(MediaTooLargeError(limit))
+        declared = Headers(scope=scope).get("content-length", "")
+        if declared.isdigit() and int(declared) > limit:
+            # Тело даже не читаем: клиент узнает об отказе до загрузки
+            response = JSONResponse({"detail": detail}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # HTTPException FastAPI пропускает из разбора формы как есть
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
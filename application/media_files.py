@@ -0,0 +1,89 @@
+"""Uploaded media: immutable caching, digest ETags and X-Accel-Redirect."""
+
+import os
+import re
+from urllib.parse import quote
+
+from anyio import to_thread
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, PathLike, StaticFiles
+from starlette.types import Scope
+
+from application.thumbnails import VARIANT_RE, generate_variants
+from core.config import MEDIA_ACCEL_REDIRECT, MEDIA_CACHE_MAX_AGE, THUMBNAIL_SIZES
+
+# ab/cd/<sha256><suffix> при MEDIA_STORAGE=content, в том числе варианты
+DIGEST_NAME = re.compile(r"^(?P<digest>[0-9a-f]{64})[^/]*$")
+
+
+def media_etag(full_path: str) -> str | None:
+    """Strong ETag of a content-addressed file, None for uuid names."""
+
+    name = os.path.basename(full_path)
+    match = DIGEST_NAME.match(name)
+    if match is None:
+        return None
+    variant = VARIANT_RE.match(name)
+    if variant is not None:
+        return f'"{match["digest"]}-{variant["size"]}"'
+    return f'"{match["digest"]}"'
+
+
+class MediaFiles(StaticFiles):
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+
+        # Еще не отрисованный вариант изображения рисуется по первому запросу
+        try:
+            return await super().get_response(path, scope)
+        except HTTPException as e:
+            variant = VARIANT_RE.match(path)
+            if (
+                e.status_code != 404
+                or variant is None
+                or int(variant["size"]) not in THUMBNAIL_SIZES
+            ):
+                raise
+
+        full_path, stat_result = await to_thread.run_sync(
+            self.lookup_path, variant["original"]
+        )
+        if stat_result is None:
+            raise HTTPException(status_code=404)
+        await generate_variants(full_path)
+        return await super().get_response(path, scope)
+
+    def file_response(
+        self,
+        full_path: PathLike,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+
+        full_path = os.fspath(full_path)
+        headers = {"Cache-Control": f"public, max-age={MEDIA_CACHE_MAX_AGE}, immutable"}
+        etag = media_etag(full_path)
+        if etag is not None:
+            headers["ETag"] = etag
+
+        response: Response
+        if MEDIA_ACCEL_REDIRECT:
+            relative = os.path.relpath(full_path, self.directory)
+            headers["X-Accel-Redirect"] = MEDIA_ACCEL_REDIRECT + quote(relative)
+            # Без Content-Type: его по расширению выставит nginx
+            response = Response(status_code=status_code, headers=headers)
+        else:
+            response = FileResponse(
+                full_path,
+                status_code=status_code,
+                stat_result=stat_result,
+                headers=headers,
+            )
+
+        request_headers = Headers(scope=scope)
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
@@ -0,0 +1,186 @@
+"""Removal of unattached media rows and orphaned files under the media directory."""
+
+import argparse
+import asyncio
+import itertools
+import os
+import pathlib
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, Optional, Sequence
+
+from anyio import to_thread
+from loguru import logger
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from application.crud.tweets import lock_paths, unused_paths
+from application.models import Media
+from application.thumbnails import original_of, with_variants
+from core.config import MEDIA_DIR, MEDIA_GC_BATCH, MEDIA_GC_MAX_AGE
+from core.database import async_session, dispose_engines
+
+
+@dataclass
+class GcReport:
+
+    rows: int = 0
+    files: int = 0
+    bytes: int = 0
+
+
+def reclaim(paths: Sequence[str]) -> tuple[int, int]:
+    """Remove files, return how many were removed and their total size."""
+
+    removed = size = 0
+    for path in paths:
+        try:
+            file_size = os.stat(path).st_size
+            os.remove(path)
+        except FileNotFoundError:
+            continue
+        except OSError as e:
+            logger.warning("Unable to delete {}: {}", path, e)
+            continue
+        removed += 1
+        size += file_size
+
+    return removed, size
+
+
+def iter_old_files(media_dir: pathlib.Path, cutoff: float) -> Iterator[str]:
+
+    # Пути отдаются в том же виде, в каком их пишет загрузка: от media_dir,
+    # даже если обход идет по разрешенному каталогу
+    root = media_dir.resolve()
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            try:
+                if os.stat(path).st_mtime < cutoff:
+                    yield os.path.join(media_dir, os.path.relpath(path, root))
+            except FileNotFoundError:
+                continue
+
+
+async def collect_unattached(
+    session: AsyncSession, max_age: float, batch_size: int, report: GcReport
+):
+
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=max_age)
+    while True:
+        expired = (
+            select(Media.id)
+            .where(Media.tweet_id.is_(None), Media.created_at < cutoff)
+            .order_by(Media.id)
+            .limit(batch_size)
+            # Строки, которые сейчас привязывает created_tweet, пропускаем
+            .with_for_update(skip_locked=True)
+        )
+        result = await session.execute(
+            delete(Media)
+            .where(Media.id.in_(expired.scalar_subquery()), Media.tweet_id.is_(None))
+            .returning(Media.path)
+        )
+        paths = sorted(set(result.scalars().all()))
+        await session.commit()
+        if not paths:
+            return
+
+        # Как и при удалении твита: путь могла занять новая загрузка тех же байтов
+        async with (
+            session.begin_nested() if session.in_transaction() else session.begin()
+        ):
+            await lock_paths(session, paths)
+            orphaned = await unused_paths(session, paths)
+            removed, size = await to_thread.run_sync(reclaim, with_variants(orphaned))
+        report.rows += len(paths)
+        report.files += removed
+        report.bytes += size
+
+
+async def collect_orphan_files(
+    session: AsyncSession,
+    media_dir: pathlib.Path,
+    max_age: float,
+    batch_size: int,
+    report: GcReport,
+):
+
+    files = iter_old_files(media_dir, time.time() - max_age)
+    while True:
+        batch = await to_thread.run_sync(
+            lambda: list(itertools.islice(files, batch_size))
+        )
+        if not batch:
+            return
+
+        # Уменьшенная копия живет, пока есть запись об оригинале
+        owners = {path: original_of(path) or path for path in batch}
+        # Под блокировкой путей: загрузка тех же байтов не успеет опубликовать
+        # файл и вставить запись между проверкой и удалением
+        async with (
+            session.begin_nested() if session.in_transaction() else session.begin()
+        ):
+            await lock_paths(session, sorted(set(owners.values())))
+            unused = set(await unused_paths(session, sorted(set(owners.values()))))
+            removed, size = await to_thread.run_sync(
+                reclaim, [path for path, owner in owners.items() if owner in unused]
+            )
+        report.files += removed
+        report.bytes += size
+
+
+async def collect_garbage(
+    session: AsyncSession,
+    media_dir: str | pathlib.Path = MEDIA_DIR,
+    max_age: Optional[float] = None,
+    batch_size: Optional[int] = None,
+) -> GcReport:
+
+    max_age = MEDIA_GC_MAX_AGE if max_age is None else max_age
+    batch_size = batch_size or MEDIA_GC_BATCH
+    report = GcReport()
+
+    await collect_unattached(session, max_age, batch_size, report)
+    await collect_orphan_files(
+        session, pathlib.Path(media_dir), max_age, batch_size, report
+    )
+
+    logger.info(
+        "Media GC: {} rows, {} files, {} bytes reclaimed",
+        report.rows,
+        report.files,
+        report.bytes,
+    )
+    return report
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Delete orphaned media")
+    parser.add_argument("--media-dir", type=pathlib.Path, default=MEDIA_DIR)
+    parser.add_argument("--max-age", type=float, default=MEDIA_GC_MAX_AGE)
+    parser.add_argument("--batch-size", type=int, default=MEDIA_GC_BATCH)
+    args = parser.parse_args()
+    # Записи Media хранят абсолютные пути от MEDIA_DIR: для другого каталога
+    # каждый старый файл выглядел бы сиротой и был бы удален
+    if args.media_dir.resolve() != MEDIA_DIR.resolve():
+        parser.error(f"--media-dir must be {MEDIA_DIR}")
+
+    async def run() -> GcReport:
+        try:
+            async with async_session() as session:
+                return await collect_garbage(
+                    session, MEDIA_DIR, args.max_age, args.batch_size
+                )
+        finally:
+            await dispose_engines()
+
+    report = asyncio.run(run())
+    print(f"{report.rows} rows, {report.files} files, {report.bytes} bytes reclaimed")
+
+
+if __name__ == "__main__":
+    main()
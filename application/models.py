@@ -1,6 +1,8 @@
+from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import ForeignKey, String
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, String, false, func
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from core.database import Base
@@ -9,6 +11,8 @@ from core.database import Base
 class Tweet(Base):
 
     __tablename__ = "tweet"
+    # Ключ для keyset-пагинации ленты: твиты автора в порядке id
+    __table_args__ = (Index("ix_tweet_user_id_id", "user_id", "id"),)
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     tweet_data: Mapped[str] = mapped_column(String(280), nullable=False)  #
@@ -18,6 +22,8 @@ class Tweet(Base):
 
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
     author: Mapped["User"] = relationship(back_populates="tweets")
+    # Денормализованный счетчик, меняется вместе с таблицей likes
+    likes_count: Mapped[int] = mapped_column(default=0, server_default="0")
 
     # Отношение к пользователям, которые лайкнули этот твит
     liked_by_users: Mapped[list["Likes"]] = relationship(back_populates="tweet")
@@ -34,16 +40,36 @@ class Tweet(Base):
 
 class Media(Base):
     __tablename__ = "media"
+    # Выборка сборщика мусора: непривязанные к твиту загрузки по возрасту
+    __table_args__ = (
+        Index(
+            "ix_media_unattached_created_at",
+            "created_at",
+            postgresql_where="tweet_id IS NULL",
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
-    path: Mapped[str] = mapped_column(String(1024))
+    # Один файл может принадлежать нескольким записям (MEDIA_STORAGE=content),
+    # число записей с этим path и есть счетчик ссылок на файл
+    path: Mapped[str] = mapped_column(String(1024), index=True)
+    content_hash: Mapped[Optional[str]] = mapped_column(String(64))
+    # Стороны уже отрисованных уменьшенных копий; NULL — еще не отрисовывались
+    variants: Mapped[Optional[list[int]]] = mapped_column(ARRAY(Integer))
     tweet_id: Mapped[Optional[int]] = mapped_column(ForeignKey("tweet.id"))
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
 
     tweet: Mapped[Optional["Tweet"]] = relationship(back_populates="tweet_media_ids")
 
 
 class FollowLink(Base):
     __tablename__ = "followers"
+    # Обратный индекс для выборки подписчиков пользователя
+    __table_args__ = (
+        Index("ix_followers_followed_id_follower_id", "followed_id", "follower_id"),
+    )
 
     follower_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
     followed_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
@@ -59,6 +85,17 @@ class Likes(Base):
     tweet: Mapped["Tweet"] = relationship(back_populates="liked_by_users")
 
 
+class TimelineEntry(Base):
+    __tablename__ = "timeline"
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    tweet_id: Mapped[int] = mapped_column(
+        ForeignKey("tweet.id", ondelete="CASCADE"), primary_key=True, index=True
+    )
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -66,6 +103,11 @@ class User(Base):
     name: Mapped[str] = mapped_column(String(50))
     api_key: Mapped[str] = mapped_column(String(200), index=True)
     role: Mapped[str] = mapped_column(String(100), default="user")
+    # Твиты таких авторов не рассылаются по лентам, а подтягиваются при чтении
+    is_celebrity: Mapped[bool] = mapped_column(default=False, server_default=false())
+    # Денормализованные счетчики, меняются вместе с таблицей followers
+    followers_count: Mapped[int] = mapped_column(default=0, server_default="0")
+    following_count: Mapped[int] = mapped_column(default=0, server_default="0")
     tweets: Mapped[list["Tweet"]] = relationship(back_populates="author")
     followers: Mapped[list["User"]] = relationship(
         "User",
@@ -0,0 +1,51 @@
+import base64
+from dataclasses import dataclass
+from typing import Optional, Sequence, TypeVar
+
+from fastapi import HTTPException, Query
+
+from core.config import FEED_PAGE_SIZE, MAX_PAGE_SIZE
+
+T = TypeVar("T")
+
+# Курсор — id строки, а id в базе типа integer: больше Postgres не примет
+MAX_CURSOR = 2**31 - 1
+
+
+@dataclass(frozen=True)
+class PageParams:
+    """Keyset position (id of the last seen row) and page size."""
+
+    cursor: Optional[int]
+    limit: int
+
+
+def encode_cursor(value: int) -> str:
+    return base64.urlsafe_b64encode(str(value).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        value = int(base64.urlsafe_b64decode(padded.encode()).decode())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not 0 < value <= MAX_CURSOR:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return value
+
+
+def page_params(
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(FEED_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+) -> PageParams:
+    return PageParams(
+        cursor=decode_cursor(cursor) if cursor else None,
+        limit=limit,
+    )
+
+
+def split_page(rows: Sequence[T], limit: int) -> tuple[Sequence[T], bool]:
+    """Cut a `limit + 1` fetch down to one page and report whether more exist."""
+
+    return rows[:limit], len(rows) > limit
@@ -0,0 +1,263 @@
+"""Versioned feed and profile responses: Redis cache and ETags."""
+
+import asyncio
+import time
+from functools import lru_cache
+from hashlib import blake2b
+from typing import Awaitable, Callable, Literal, Optional, Sequence
+
+from fastapi import Response, status
+from loguru import logger
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from application import background, timeline
+from application.models import Tweet, User
+from application.serializers import json_response
+from core.config import (
+    CELEBRITY_FOLLOWER_THRESHOLD,
+    RESPONSE_CACHE,
+    RESPONSE_CACHE_TTL,
+    RESPONSE_VERSIONS,
+)
+from core.metrics import CACHE_REQUESTS
+from core.redis_client import get_redis
+
+Scope = Literal["feed", "profile"]
+Render = Callable[[], Awaitable[bytes]]
+
+
+# Запись увеличивает версии всех, чей ответ она меняет; тела кэшируются под
+# версией и не удаляются — старые просто не читаются и истекают по TTL
+class VersionStore:
+
+    def __init__(self, redis: Redis):
+        self.redis = redis
+
+    @staticmethod
+    def key(scope: Scope, owner_id: int) -> str:
+        return f"cachever:{scope}:{owner_id}"
+
+    async def current(self, scope: Scope, owner_id: int) -> Optional[int]:
+        """Version of the owner's responses, None when Redis is unavailable."""
+
+        try:
+            version = await self.redis.get(self.key(scope, owner_id))
+        except RedisError as e:
+            logger.error("Response versions are unavailable: {}", e)
+            CACHE_REQUESTS.labels(scope, "error").inc()
+            return None
+
+        return int(version or 0)
+
+    async def bump(self, scope: Scope, owner_ids: Sequence[int]):
+
+        if not owner_ids:
+            return
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for owner_id in owner_ids:
+                    pipe.incr(self.key(scope, owner_id))
+                await pipe.execute()
+        except RedisError as e:
+            logger.error("Unable to invalidate {} {}: {}", scope, owner_ids, e)
+
+
+class ResponseCache:
+
+    def __init__(self, redis: Redis, ttl: int = RESPONSE_CACHE_TTL):
+        self.redis = redis
+        self.ttl = ttl
+        # Рендеры в процессе: конкурентные промахи по ключу ждут один запрос в БД
+        self.in_flight: dict[str, asyncio.Future[Optional[bytes]]] = {}
+
+    @staticmethod
+    def key(scope: Scope, owner_id: int, version: int, variant: str) -> str:
+        return f"cache:{scope}:{owner_id}:{version}:{variant}"
+
+    async def fetch(
+        self, scope: Scope, owner_id: int, version: int, variant: str, render: Render
+    ) -> bytes:
+        """Cached body, or `render()` stored for the next readers."""
+
+        key = self.key(scope, owner_id, version, variant)
+        try:
+            body = await self.redis.get(key)
+        except RedisError as e:
+            # Без кэша отвечаем из БД, Redis не должен ронять чтение
+            logger.error("Response cache is unavailable: {}", e)
+            CACHE_REQUESTS.labels(scope, "error").inc()
+            return await render()
+
+        if body is not None:
+            CACHE_REQUESTS.labels(scope, "hit").inc()
+            return body
+
+        CACHE_REQUESTS.labels(scope, "miss").inc()
+        return await self.single_flight(key, render)
+
+    async def single_flight(self, key: str, render: Render) -> bytes:
+
+        leader = self.in_flight.get(key)
+        if leader is not None:
+            body = await asyncio.shield(leader)
+            if body is not None:
+                return body
+            # Рендер лидера упал: каждый пробует сам и получает свою ошибку
+            return await render()
+
+        future: asyncio.Future[Optional[bytes]] = (
+            asyncio.get_running_loop().create_future()
+        )
+        self.in_flight[key] = future
+        body = None
+        try:
+            body = await render()
+            try:
+                await self.redis.set(key, body, ex=self.ttl)
+            except RedisError as e:
+                logger.error("Unable to store {}: {}", key, e)
+            return body
+        finally:
+            del self.in_flight[key]
+            future.set_result(body)
+
+
+def build_versions(redis: Redis) -> Optional[VersionStore]:
+    return VersionStore(redis) if RESPONSE_VERSIONS else None
+
+
+@lru_cache
+def get_versions() -> Optional[VersionStore]:
+    return build_versions(get_redis())
+
+
+@lru_cache
+def get_cache() -> Optional[ResponseCache]:
+    return ResponseCache(get_redis()) if RESPONSE_CACHE else None
+
+
+def version_etag(scope: Scope, owner_id: int, version: int, variant: str) -> str:
+
+    # Ленты подписчиков pull-авторов версию не меняют, поэтому в ETag и окно TTL
+    window = int(time.time()) // RESPONSE_CACHE_TTL
+    digest = blake2b(variant.encode(), digest_size=8).hexdigest()
+    return f'W/"{scope}-{owner_id}-{version}-{window}-{digest}"'
+
+
+def body_etag(body: bytes) -> str:
+    return f'"{blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison, as If-None-Match requires (RFC 9110, 13.1.2)."""
+
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+
+def conditional_headers(etag: str) -> dict[str, str]:
+    # Ответ зависит от api-key: браузер хранит его у себя и всегда сверяет ETag
+    return {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "api-key"}
+
+
+def not_modified(etag: str) -> Response:
+
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED, headers=conditional_headers(etag)
+    )
+
+
+async def versioned_response(
+    scope: Scope,
+    owner_id: int,
+    variant: str,
+    render: Render,
+    if_none_match: Optional[str] = None,
+) -> Response:
+    """JSON response of `render()` with an ETag, 304 or a cached body."""
+
+    versions = get_versions()
+    version = await versions.current(scope, owner_id) if versions else None
+
+    if version is not None:
+        etag = version_etag(scope, owner_id, version, variant)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+
+        cache = get_cache()
+        if cache is not None:
+            body = await cache.fetch(scope, owner_id, version, variant, render)
+        else:
+            body = await render()
+    else:
+        # Версий нет: запросы выполняются, но тело не уходит повторно
+        body = await render()
+        etag = body_etag(body)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+
+    response = json_response(body)
+    response.headers.update(conditional_headers(etag))
+    return response
+
+
+async def bump_author_feeds(
+    session: AsyncSession, versions: VersionStore, author_id: int
+):
+    """Feeds of the author's followers; runs in the Celery worker."""
+
+    result = await session.execute(
+        select(User.followers_count).where(User.id == author_id)
+    )
+    followers_count = result.scalar_one_or_none()
+    # В режиме pull это был бы INCR на каждого подписчика: устаревание
+    # ограничивает TTL кэша
+    if followers_count is None or followers_count >= CELEBRITY_FOLLOWER_THRESHOLD:
+        return
+
+    async for batch in timeline.iter_follower_batches(session, author_id):
+        await versions.bump("feed", batch)
+
+
+async def invalidate_author_feeds(author_id: int):
+    """After a tweet of the author is posted or deleted."""
+
+    # С материализованными лентами версии поднимают fan_out_tweet и
+    # retract_tweet, уже записав ленты: иначе чтение до записи закэширует
+    # старую ленту под новой версией
+    if get_versions() is None or timeline.get_backend() is not None:
+        return
+
+    await background.send_task("invalidate_author_feeds", author_id)
+
+
+async def invalidate_tweet_feeds(session: AsyncSession, tweet_id: int):
+
+    if get_versions() is None:
+        return
+
+    tweet = await session.get(Tweet, tweet_id)
+    if tweet is not None:
+        await background.send_task("invalidate_author_feeds", tweet.user_id)
+
+
+async def invalidate_follow(follower_id: int, followed_id: int):
+
+    versions = get_versions()
+    if versions is None:
+        return
+
+    # Лента подписчика поднимается еще раз задачей backfill_follow/retract_follow
+    await versions.bump("feed", [follower_id])
+    await versions.bump("profile", [follower_id, followed_id])
@@ -1,11 +1,10 @@
-import os
-import pathlib
-import uuid
-from typing import Annotated
+import asyncio
+from functools import partial
+from typing import Annotated, Literal, Optional, Sequence
 
-import aiofiles
 from fastapi import (
     APIRouter,
+    BackgroundTasks,
     Depends,
     Header,
     HTTPException,
@@ -15,10 +14,13 @@ from fastapi import (
 )
 from fastapi.responses import JSONResponse
 from loguru import logger
+from sqlalchemy import Row
 from sqlalchemy.exc import IntegrityError, MissingGreenlet
 from sqlalchemy.ext.asyncio import AsyncSession
 
 import application.schemas
+from application import response_cache
+from application.auth import cache_user, cached_user
 from application.crud.followers import create_follow, del_follow, get_follow
 from application.crud.likes import create_like, del_like, get_like
 from application.crud.tweets import (
@@ -27,16 +29,26 @@ from application.crud.tweets import (
     get_tweet,
     get_tweet_by_id,
     get_tweets_all,
+    make_variants,
+    remove_unused_files,
     save_media,
+    save_media_batch,
+    unreferenced_paths,
 )
 from application.crud.users import (
     create_user,
+    get_follow_page,
     get_profile,
     get_user,
     get_user_by_api_key,
 )
+from application.exceptions import MediaTooLargeError
+from application.media import discard, store_upload
 from application.models import Media, User
-from core.config import MEDIA_DIR
+from application.pagination import PageParams, encode_cursor, page_params, split_page
+from application.serializers import render_feed
+from application.thumbnails import is_image
+from core.config import MEDIA_BATCH_MAX_FILES, MEDIA_DIR, PROFILE_PAGE_SIZE
 from core.database import get_db
 
 schemas = application.schemas
@@ -48,25 +60,81 @@ async def get_current_user(
     api_key: Annotated[str, Header()], session: AsyncSession = Depends(get_db)
 ) -> User:
 
-    user = await get_user_by_api_key(session, api_key)
+    user = cached_user(api_key)
+    if user is None:
+        user = await get_user_by_api_key(session, api_key)
 
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found"
-        )
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found"
+            )
+        cache_user(user)
     logger.info("User {} identified.", user.name)
     return user
 
 
-@router.get("/users/me", response_model=schemas.UserInfo)
+async def follow_page(
+    session: AsyncSession,
+    user_id: int,
+    direction: Literal["followers", "following"],
+    limit: int,
+    after_id: Optional[int] = None,
+) -> tuple[Sequence[Row[tuple[int, str]]], Optional[str]]:
+
+    rows = await get_follow_page(session, user_id, direction, limit + 1, after_id)
+    users, has_more = split_page(rows, limit)
+
+    return users, encode_cursor(users[-1].id) if has_more else None
+
+
+async def profile_response(session: AsyncSession, user: User, counts_only: bool):
+
+    if counts_only:
+        return schemas.UserCountsInfo.model_validate({"user": user})
+
+    followers, followers_cursor = await follow_page(
+        session, user.id, "followers", PROFILE_PAGE_SIZE
+    )
+    following, following_cursor = await follow_page(
+        session, user.id, "following", PROFILE_PAGE_SIZE
+    )
+    profile = {
+        "id": user.id,
+        "name": user.name,
+        "followers": followers,
+        "following": following,
+        "followers_count": user.followers_count,
+        "following_count": user.following_count,
+        "followers_cursor": followers_cursor,
+        "following_cursor": following_cursor,
+    }
+
+    return schemas.UserInfo.model_validate({"user": profile})
+
+
+@router.get("/users/me", response_model=schemas.UserInfo | schemas.UserCountsInfo)
 async def auth_user(
     current_user: User = Depends(get_current_user),
     session: AsyncSession = Depends(get_db),
+    counts_only: bool = False,
+    if_none_match: Annotated[Optional[str], Header()] = None,
 ):
 
-    user = await get_user(session, current_user)
+    async def render() -> bytes:
 
-    return {"result": True, "user": user}
+        user = await get_user(session, current_user)
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found"
+            )
+
+        profile = await profile_response(session, user, counts_only)
+        return profile.model_dump_json(by_alias=True).encode()
+
+    # Тот же ответ, что и /users/{id} для себя: общие версия и запись кэша
+    return await response_cache.versioned_response(
+        "profile", current_user.id, str(int(counts_only)), render, if_none_match
+    )
 
 
 @router.post("/tweets", response_model=schemas.AddTweet)
@@ -86,28 +154,84 @@ async def add_tweet(
 
 
 @router.post("/medias", response_model=schemas.UploadMedia)
-async def upload_media(file: UploadFile, session: AsyncSession = Depends(get_db)):
+async def upload_media(
+    file: UploadFile,
+    background_tasks: BackgroundTasks,
+    session: AsyncSession = Depends(get_db),
+):
     if not file.filename:
         raise HTTPException(status_code=400, detail="Filename is missing")
 
-    file_path = (
-        pathlib.Path(MEDIA_DIR) / f"{uuid.uuid4()}{pathlib.Path(file.filename).suffix}"
-    )
+    try:
+        stored = await store_upload(file, MEDIA_DIR)
+    except MediaTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
 
-    async with aiofiles.open(str(file_path), "wb") as out_file:
-        content = await file.read()
-        await out_file.write(content)
     media_data = dict()
-    media_data["path"] = str(file_path)
+    media_data["path"] = str(stored.path)
+    media_data["content_hash"] = stored.digest
     new_media = Media(**media_data)
 
-    await save_media(session, new_media)
+    try:
+        await save_media(session, new_media, stored)
+    except BaseException:
+        await discard([stored])
+        raise
     response = {"media_id": new_media.id}
     logger.info("Image: {} saved successful.", new_media.id)
 
+    if is_image(new_media.path):
+        background_tasks.add_task(make_variants, session, [new_media.path])
+
     return response
 
 
+@router.post("/medias/batch", response_model=schemas.UploadMediaBatch)
+async def upload_media_batch(
+    files: list[UploadFile],
+    background_tasks: BackgroundTasks,
+    session: AsyncSession = Depends(get_db),
+):
+    if len(files) > MEDIA_BATCH_MAX_FILES:
+        raise HTTPException(
+            status_code=400, detail=f"At most {MEDIA_BATCH_MAX_FILES} files allowed"
+        )
+    if not all(file.filename for file in files):
+        raise HTTPException(status_code=400, detail="Filename is missing")
+
+    results = await asyncio.gather(
+        *(store_upload(file, MEDIA_DIR) for file in files), return_exceptions=True
+    )
+    stored = [result for result in results if not isinstance(result, BaseException)]
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if errors:
+        # Пачка сохраняется целиком либо никак
+        await discard(stored)
+        if isinstance(errors[0], MediaTooLargeError):
+            raise HTTPException(status_code=413, detail=str(errors[0]))
+        raise errors[0]
+
+    try:
+        media_ids = await save_media_batch(
+            session,
+            [{"path": str(file.path), "content_hash": file.digest} for file in stored],
+            stored,
+        )
+    except BaseException:
+        # Файлы могли уже переехать на свои места: удаляем те, на которые не
+        # ссылается ни одна запись (тот же файл мог загрузить кто-то еще)
+        await discard(stored)
+        await remove_unused_files(session, [str(file.path) for file in stored])
+        raise
+    logger.info("Images: {} saved successful.", media_ids)
+
+    images = [str(file.path) for file in stored if is_image(str(file.path))]
+    if images:
+        background_tasks.add_task(make_variants, session, images)
+
+    return {"result": True, "media_ids": media_ids}
+
+
 @router.post("/user", response_model=schemas.AddUser)
 async def add_user(
     user: schemas.AddUser, session: AsyncSession = Depends(get_db)
@@ -123,6 +247,7 @@ async def add_user(
 @router.delete("/tweets/{tweet_id}", response_model=schemas.ResultTrue)
 async def delete_tweet(
     tweet_id: int,
+    background_tasks: BackgroundTasks,
     session: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
@@ -134,10 +259,7 @@ async def delete_tweet(
         logger.warning("attempted unauthorized deletion! User:{}", current_user.name)
         raise HTTPException(status_code=400, detail="Cannot be deleted")
 
-    for media in tweet.tweet_media_ids:
-        if os.path.exists(media.path):
-            os.remove(media.path)
-            logger.info("File {} deleted from disk", media.path)
+    paths = await unreferenced_paths(session, tweet)
 
     try:
         await del_tweet(session, tweet)
@@ -145,43 +267,115 @@ async def delete_tweet(
         logger.warning("User: {}  Entry does not exist.", current_user.name)
         raise HTTPException(status_code=400, detail=f"Entry does not exist.{e}")
 
+    # Файлы удаляются только после коммита и уже после отправки ответа,
+    # с повторной проверкой ссылок под блокировкой пути
+    background_tasks.add_task(remove_unused_files, session, paths)
+
     return {"result": True}
 
 
-@router.get("/tweets", response_model=schemas.GetTweets)
+async def feed_body(
+    session: AsyncSession, user: User, page: PageParams, counts_only: bool
+) -> bytes:
+
+    rows = await get_tweets_all(
+        session,
+        user,
+        limit=page.limit + 1,
+        before_id=page.cursor,
+        with_likes=not counts_only,
+    )
+    tweets, has_more = split_page(rows, page.limit)
+    next_cursor = encode_cursor(tweets[-1].id) if has_more else None
+
+    return render_feed(tweets, next_cursor, counts_only)
+
+
+@router.get("/tweets", response_model=schemas.GetTweets | schemas.GetTweetCounts)
 async def get_tweets(
     current_user: User = Depends(get_current_user),
     session: AsyncSession = Depends(get_db),
+    page: PageParams = Depends(page_params),
+    counts_only: bool = False,
+    if_none_match: Annotated[Optional[str], Header()] = None,
 ):
 
-    tweets = await get_tweets_all(session, current_user)
+    render = partial(feed_body, session, current_user, page, counts_only)
+    variant = f"{page.cursor}:{page.limit}:{int(counts_only)}"
+    response = await response_cache.versioned_response(
+        "feed", current_user.id, variant, render, if_none_match
+    )
     logger.info("User {}. The tweet feed is loaded", current_user.name)
 
-    return schemas.GetTweets.model_validate({"tweets": tweets})
+    # response_model остается для документации, сам ответ уже сериализован
+    return response
 
 
-@router.get("/users/{id}", response_model=schemas.UserInfo)
+@router.get("/users/{id}", response_model=schemas.UserInfo | schemas.UserCountsInfo)
 async def get_profile_with_id(
     id: Annotated[int, Path()],
     current_user: User = Depends(get_current_user),
     session: AsyncSession = Depends(get_db),
+    counts_only: bool = False,
+    if_none_match: Annotated[Optional[str], Header()] = None,
 ):
 
-    user = await get_profile(session, id)
-    if not user:
+    async def render() -> bytes:
 
-        logger.warning(
-            "User with id {} not found. Request completed by user {}", current_user.name
-        )
-        raise HTTPException(status_code=400, detail="Bad request!")
+        user = await get_profile(session, id)
+        if not user:
+
+            logger.warning(
+                "User with id {} not found. Request completed by user {}",
+                id,
+                current_user.name,
+            )
+            raise HTTPException(status_code=400, detail="Bad request!")
+
+        profile = await profile_response(session, user, counts_only)
+        return profile.model_dump_json(by_alias=True).encode()
+
+    response = await response_cache.versioned_response(
+        "profile", id, str(int(counts_only)), render, if_none_match
+    )
 
     logger.info(
         "Completed request user {} on profile user {} successfully.",
         current_user.name,
-        user.name,
+        id,
+    )
+
+    return response
+
+
+@router.get("/users/{id}/followers", response_model=schemas.UserPage)
+async def get_followers(
+    id: Annotated[int, Path()],
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_db),
+    page: PageParams = Depends(page_params),
+):
+
+    users, next_cursor = await follow_page(
+        session, id, "followers", page.limit, page.cursor
+    )
+
+    return {"result": True, "users": users, "next_cursor": next_cursor}
+
+
+@router.get("/users/{id}/following", response_model=schemas.UserPage)
+async def get_following(
+    id: Annotated[int, Path()],
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_db),
+    page: PageParams = Depends(page_params),
+):
+
+    users, next_cursor = await follow_page(
+        session, id, "following", page.limit, page.cursor
     )
 
-    return {"result": True, "user": user}
+    return {"result": True, "users": users, "next_cursor": next_cursor}
 
 
 @router.post("/tweets/{id}/likes", response_model=schemas.ResultTrue)
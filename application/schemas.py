@@ -8,6 +8,13 @@ class UploadMedia(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class UploadMediaBatch(BaseModel):
+
+    result: bool = True
+
+    media_ids: list[int]
+
+
 class GetMedia(BaseModel):
 
     path: str
@@ -34,9 +41,44 @@ class UserBase(BaseModel):
 
 class UserDetail(UserBase):
 
+    # Только первая страница, дальше — /users/{id}/followers и /following
     followers: list[UserBase] = []
     following: list[UserBase] = []
 
+    followers_count: int = 0
+    following_count: int = 0
+
+    followers_cursor: str | None = None
+    following_cursor: str | None = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class UserPage(BaseModel):
+
+    result: bool = True
+
+    users: list[UserBase]
+
+    next_cursor: str | None = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class UserCounts(UserBase):
+
+    followers_count: int
+    following_count: int
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class UserCountsInfo(BaseModel):
+
+    result: bool = True
+
+    user: UserCounts
+
     model_config = ConfigDict(from_attributes=True)
 
 
@@ -84,7 +126,7 @@ class AddLike(BaseModel):
     tweet_id: int = Field(alias="id")
 
 
-class Tweet(BaseModel):
+class TweetBase(BaseModel):
 
     model_config = ConfigDict(from_attributes=True, populate_by_name=True)
 
@@ -96,9 +138,10 @@ class Tweet(BaseModel):
 
     attachments: list[str] = Field(validation_alias="tweet_media_ids")
 
-    author: UserBase = Field(validation_alias="author")
+    # Для каждого вложения: {"320": url, "1080": url} уменьшенных WebP-копий
+    attachment_variants: list[dict[str, str]] = []
 
-    likes: list[Like]
+    author: UserBase = Field(validation_alias="author")
 
     @field_validator("attachments", mode="before")
     @classmethod
@@ -110,12 +153,35 @@ class Tweet(BaseModel):
         return v
 
 
+class Tweet(TweetBase):
+
+    likes: list[Like]
+
+
+class TweetCounts(TweetBase):
+
+    likes_count: int
+
+
+class GetTweetCounts(BaseModel):
+
+    result: bool = True
+
+    tweets: list[TweetCounts]
+
+    next_cursor: str | None = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
 class GetTweets(BaseModel):
 
     result: bool = True
 
     tweets: list[Tweet]
 
+    next_cursor: str | None = None
+
     model_config = ConfigDict(from_attributes=True)
 
 
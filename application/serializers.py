@@ -0,0 +1,61 @@
+"""Feed rendering from row tuples with orjson, without pydantic."""
+
+from typing import Any, NamedTuple, Optional, Sequence
+
+import orjson
+from fastapi import Response
+
+from application.thumbnails import variant_urls
+
+
+class FeedRow(NamedTuple):
+
+    id: int
+    content: str
+    author_id: int
+    author_name: str
+    attachments: list[str]
+    # Стороны готовых уменьшенных копий каждого вложения
+    attachment_variants: list[Optional[list[int]]]
+    # [{"user_id": ..., "name": ...}] либо None в режиме counts_only
+    likes: Optional[list[dict[str, Any]]]
+    likes_count: int
+
+
+def feed_payload(
+    rows: Sequence[FeedRow], next_cursor: Optional[str], counts_only: bool = False
+) -> dict[str, Any]:
+    """`schemas.GetTweets` (or `GetTweetCounts`) shaped dict."""
+
+    tweets = []
+    for row in rows:
+        tweet = {
+            "id": row.id,
+            "content": row.content,
+            "attachments": row.attachments,
+            "attachment_variants": [
+                variant_urls(path, sizes)
+                for path, sizes in zip(row.attachments, row.attachment_variants)
+            ],
+            "author": {"id": row.author_id, "name": row.author_name},
+        }
+        if counts_only:
+            tweet["likes_count"] = row.likes_count
+        else:
+            tweet["likes"] = row.likes or []
+        tweets.append(tweet)
+
+    return {"result": True, "tweets": tweets, "next_cursor": next_cursor}
+
+
+def render_feed(
+    rows: Sequence[FeedRow], next_cursor: Optional[str], counts_only: bool = False
+) -> bytes:
+
+    return orjson.dumps(feed_payload(rows, next_cursor, counts_only))
+
+
+def json_response(body: bytes) -> Response:
+    """Already serialized body; FastAPI skips the response model for it."""
+
+    return Response(body, media_type="application/json")
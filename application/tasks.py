@@ -0,0 +1,127 @@
+import asyncio
+from typing import Awaitable, Callable, Optional
+
+from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from application import media_gc, response_cache, timeline
+from application.crud.counters import reconcile_counters as reconcile
+from core.celery_app import app
+from core.config import APP_REDIS_URL, MEDIA_DIR
+from core.database import database_url
+
+
+def run_in_worker(operation, *args):
+    """Run `operation(session, *args)` in a fresh event loop of the worker."""
+
+    # NullPool: соединения asyncpg не переживают цикл asyncio.run
+
+    async def runner():
+        engine = create_async_engine(database_url, poolclass=NullPool)
+        try:
+            async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+                return await operation(session, *args)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(runner())
+
+
+Bump = Callable[[AsyncSession, response_cache.VersionStore], Awaitable[None]]
+
+
+def run_timeline_operation(operation, *args: int, bump: Optional[Bump] = None):
+
+    async def with_backend(session, *args):
+        redis = Redis.from_url(APP_REDIS_URL)
+        try:
+            backend = timeline.build_backend(redis)
+            if backend is None:
+                return
+            await operation(session, backend, *args)
+
+            # Версии ответов поднимаются, только когда лента уже записана
+            versions = response_cache.build_versions(redis)
+            if versions is not None and bump is not None:
+                await bump(session, versions)
+        finally:
+            await redis.aclose()
+
+    run_in_worker(with_backend, *args)
+
+
+def author_feeds(author_id: int) -> Bump:
+
+    async def bump(session, versions):
+        await response_cache.bump_author_feeds(session, versions, author_id)
+
+    return bump
+
+
+def follower_feed(follower_id: int) -> Bump:
+
+    async def bump(session, versions):
+        await versions.bump("feed", [follower_id])
+
+    return bump
+
+
+@app.task(name="application.tasks.fan_out_tweet", ignore_result=True)
+def fan_out_tweet(tweet_id: int, author_id: int):
+    run_timeline_operation(
+        timeline.fan_out_tweet, tweet_id, author_id, bump=author_feeds(author_id)
+    )
+
+
+@app.task(name="application.tasks.retract_tweet", ignore_result=True)
+def retract_tweet(tweet_id: int, author_id: int):
+    run_timeline_operation(
+        timeline.retract_tweet, tweet_id, author_id, bump=author_feeds(author_id)
+    )
+
+
+@app.task(name="application.tasks.retract_follow", ignore_result=True)
+def retract_follow(follower_id: int, followed_id: int):
+    run_timeline_operation(
+        timeline.retract_follow,
+        follower_id,
+        followed_id,
+        bump=follower_feed(follower_id),
+    )
+
+
+@app.task(name="application.tasks.backfill_follow", ignore_result=True)
+def backfill_follow(follower_id: int, followed_id: int):
+    run_timeline_operation(
+        timeline.backfill_follow,
+        follower_id,
+        followed_id,
+        bump=follower_feed(follower_id),
+    )
+
+
+@app.task(name="application.tasks.invalidate_author_feeds", ignore_result=True)
+def invalidate_author_feeds(author_id: int):
+
+    async def bump(session, author_id):
+        redis = Redis.from_url(APP_REDIS_URL)
+        try:
+            versions = response_cache.build_versions(redis)
+            if versions is not None:
+                await response_cache.bump_author_feeds(session, versions, author_id)
+        finally:
+            await redis.aclose()
+
+    run_in_worker(bump, author_id)
+
+
+@app.task(name="application.tasks.reconcile_counters")
+def reconcile_counters() -> int:
+    return run_in_worker(reconcile)
+
+
+@app.task(name="application.tasks.collect_media_garbage")
+def collect_media_garbage() -> dict[str, int]:
+    report = run_in_worker(media_gc.collect_garbage, MEDIA_DIR)
+    return {"rows": report.rows, "files": report.files, "bytes": report.bytes}
@@ -0,0 +1,138 @@
+"""Downscaled WebP variants of uploaded images."""
+
+import asyncio
+import contextlib
+import multiprocessing
+import os
+import re
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Iterable, Optional, Sequence
+
+from loguru import logger
+
+from core.config import (
+    THUMBNAIL_FAILED_SIZE,
+    THUMBNAIL_QUALITY,
+    THUMBNAIL_RETRY_AFTER,
+    THUMBNAIL_SIZES,
+    THUMBNAIL_WORKERS,
+    THUMBNAILS,
+)
+from core.ttl_cache import TTLCache
+
+IMAGE_SUFFIXES = frozenset({".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp"})
+# <name>.jpg.<size>.webp рядом с оригиналом, вписан в квадрат size x size
+VARIANT_RE = re.compile(r"^(?P<original>.+)\.(?P<size>\d+)\.webp$")
+
+# Оригиналы, которые не удалось уменьшить: запросы их вариантов не гоняют
+# декодирование в пуле заново до истечения срока
+failed_renders: TTLCache[str, bool] = TTLCache(
+    THUMBNAIL_FAILED_SIZE, THUMBNAIL_RETRY_AFTER
+)
+
+
+def variant_path(path: str, size: int) -> str:
+
+    return f"{path}.{size}.webp"
+
+
+def original_of(path: str) -> Optional[str]:
+    """Original of a variant path, None for anything else."""
+
+    match = VARIANT_RE.match(path)
+    return match["original"] if match else None
+
+
+def is_image(path: str) -> bool:
+
+    return os.path.splitext(path)[1].lower() in IMAGE_SUFFIXES and not original_of(path)
+
+
+def variant_urls(path: str, sizes: Optional[Sequence[int]]) -> dict[str, str]:
+    """{"320": ".../name.jpg.320.webp", ...} for the rendered `sizes`."""
+
+    if not THUMBNAILS or not sizes:
+        return {}
+    return {
+        str(size): variant_path(path, size) for size in THUMBNAIL_SIZES if size in sizes
+    }
+
+
+def with_variants(paths: Iterable[str]) -> list[str]:
+    """Paths of originals followed by all their possible variants."""
+
+    result = []
+    for path in paths:
+        result.append(path)
+        if is_image(path):
+            result += [variant_path(path, size) for size in THUMBNAIL_SIZES]
+    return result
+
+
+def render_variants(path: str, sizes: Sequence[int], quality: int) -> list[int]:
+    """Write the missing variants of `path` in a pool process, return all sizes."""
+
+    from PIL import Image, ImageOps
+
+    missing = [size for size in sizes if not os.path.exists(variant_path(path, size))]
+    try:
+        if missing:
+            with Image.open(path) as source:
+                # JPEG декодируется сразу в уменьшенном масштабе
+                source.draft("RGB", (max(missing), max(missing)))
+                image = ImageOps.exif_transpose(source)
+                if image.mode not in ("RGB", "RGBA"):
+                    image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+                for size in sorted(missing, reverse=True):
+                    image.thumbnail((size, size), Image.Resampling.LANCZOS)
+                    target = variant_path(path, size)
+                    # Свое имя у каждой записи: вариант может рисоваться и после
+                    # загрузки, и по запросу одновременно
+                    tmp_path = f"{target}.{uuid.uuid4().hex}.part"
+                    try:
+                        image.save(tmp_path, "WEBP", quality=quality, method=4)
+                        os.replace(tmp_path, target)
+                    finally:
+                        with contextlib.suppress(FileNotFoundError):
+                            os.remove(tmp_path)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        logger.warning("Unable to make variants of {}: {}", path, e)
+
+    return [size for size in sizes if os.path.exists(variant_path(path, size))]
+
+
+@lru_cache
+def get_pool() -> ProcessPoolExecutor:
+
+    # spawn: форк процесса с event loop и открытыми соединениями небезопасен
+    return ProcessPoolExecutor(
+        max_workers=THUMBNAIL_WORKERS, mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+def shutdown_pool():
+
+    if get_pool.cache_info().currsize:
+        get_pool().shutdown(wait=False, cancel_futures=True)
+        get_pool.cache_clear()
+
+
+async def generate_variants(path: str) -> list[int]:
+    """Render the variants of an image in the process pool, return their sizes."""
+
+    if not THUMBNAILS or not THUMBNAIL_WORKERS or not is_image(path):
+        return []
+    if failed_renders.get(path):
+        return []
+
+    loop = asyncio.get_running_loop()
+    sizes = await loop.run_in_executor(
+        get_pool(), render_variants, path, THUMBNAIL_SIZES, THUMBNAIL_QUALITY
+    )
+    if set(sizes) != set(THUMBNAIL_SIZES):
+        failed_renders.set(path, True)
+    logger.info("Variants {} of {} ready", sizes, path)
+    return sizes
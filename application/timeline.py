@@ -0,0 +1,299 @@
+"""Materialized home timelines (fan-out on write)."""
+
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Optional, Sequence
+
+from loguru import logger
+from redis.asyncio import Redis
+from sqlalchemy import BigInteger, delete, func, literal, select
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from application import background
+from application.models import FollowLink, TimelineEntry, Tweet, User
+from core.config import (
+    CELEBRITY_FOLLOWER_THRESHOLD,
+    FANOUT_BATCH_SIZE,
+    TIMELINE_BACKEND,
+    TIMELINE_BACKFILL,
+    TIMELINE_MAX_LENGTH,
+)
+from core.redis_client import get_redis
+
+
+class TimelineBackend(ABC):
+
+    # Записи удаляются вместе с твитом на стороне хранилища (ON DELETE CASCADE)
+    cascades_on_delete = False
+
+    @abstractmethod
+    async def add(
+        self, session: AsyncSession, user_ids: Sequence[int], tweet_ids: Sequence[int]
+    ) -> None: ...
+
+    @abstractmethod
+    async def remove(
+        self, session: AsyncSession, user_ids: Sequence[int], tweet_ids: Sequence[int]
+    ) -> None: ...
+
+    @abstractmethod
+    async def range(
+        self,
+        session: AsyncSession,
+        user_id: int,
+        limit: int,
+        before_id: Optional[int] = None,
+    ) -> list[int]: ...
+
+
+class PostgresTimeline(TimelineBackend):
+
+    cascades_on_delete = True
+
+    def __init__(self, max_length: int = TIMELINE_MAX_LENGTH):
+        self.max_length = max_length
+
+    async def add(
+        self, session: AsyncSession, user_ids: Sequence[int], tweet_ids: Sequence[int]
+    ) -> None:
+        rows = [
+            {"user_id": user_id, "tweet_id": tweet_id}
+            for user_id in user_ids
+            for tweet_id in tweet_ids
+        ]
+        if not rows:
+            return
+        await session.execute(insert(TimelineEntry).on_conflict_do_nothing(), rows)
+
+        # Как и в Redis, храним max_length последних: порог ищется по индексу
+        # один раз на пользователя
+        users = (
+            func.unnest(literal(list(user_ids), ARRAY(BigInteger)))
+            .table_valued("user_id")
+            .render_derived(name="users")
+        )
+        entry = aliased(TimelineEntry)
+        cutoffs = select(
+            users.c.user_id,
+            select(entry.tweet_id)
+            .where(entry.user_id == users.c.user_id)
+            .order_by(entry.tweet_id.desc())
+            .offset(self.max_length)
+            .limit(1)
+            .scalar_subquery()
+            .label("cutoff"),
+        ).subquery()
+        await session.execute(
+            delete(TimelineEntry).where(
+                TimelineEntry.user_id == cutoffs.c.user_id,
+                TimelineEntry.tweet_id <= cutoffs.c.cutoff,
+            )
+        )
+
+    async def remove(
+        self, session: AsyncSession, user_ids: Sequence[int], tweet_ids: Sequence[int]
+    ) -> None:
+        await session.execute(
+            delete(TimelineEntry).where(
+                TimelineEntry.user_id.in_(user_ids),
+                TimelineEntry.tweet_id.in_(tweet_ids),
+            )
+        )
+
+    async def range(
+        self,
+        session: AsyncSession,
+        user_id: int,
+        limit: int,
+        before_id: Optional[int] = None,
+    ) -> list[int]:
+        query = (
+            select(TimelineEntry.tweet_id)
+            .where(TimelineEntry.user_id == user_id)
+            .order_by(TimelineEntry.tweet_id.desc())
+            .limit(limit)
+        )
+        if before_id is not None:
+            query = query.where(TimelineEntry.tweet_id < before_id)
+
+        result = await session.execute(query)
+
+        return list(result.scalars().all())
+
+
+class RedisTimeline(TimelineBackend):
+    """Sorted set per user, scored by tweet id and trimmed to `max_length`."""
+
+    def __init__(self, redis: Redis, max_length: int = TIMELINE_MAX_LENGTH):
+        self.redis = redis
+        self.max_length = max_length
+
+    @staticmethod
+    def key(user_id: int) -> str:
+        return f"timeline:{user_id}"
+
+    async def add(
+        self, session: AsyncSession, user_ids: Sequence[int], tweet_ids: Sequence[int]
+    ) -> None:
+        if not tweet_ids:
+            return
+        mapping = {str(tweet_id): tweet_id for tweet_id in tweet_ids}
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for user_id in user_ids:
+                pipe.zadd(self.key(user_id), mapping)
+                pipe.zremrangebyrank(self.key(user_id), 0, -self.max_length - 1)
+            await pipe.execute()
+
+    async def remove(
+        self, session: AsyncSession, user_ids: Sequence[int], tweet_ids: Sequence[int]
+    ) -> None:
+        if not tweet_ids:
+            return
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for user_id in user_ids:
+                pipe.zrem(self.key(user_id), *tweet_ids)
+            await pipe.execute()
+
+    async def range(
+        self,
+        session: AsyncSession,
+        user_id: int,
+        limit: int,
+        before_id: Optional[int] = None,
+    ) -> list[int]:
+        upper = f"({before_id}" if before_id is not None else "+inf"
+        members = await self.redis.zrevrangebyscore(
+            self.key(user_id), upper, "-inf", start=0, num=limit
+        )
+
+        return [int(member) for member in members]
+
+
+def build_backend(redis: Optional[Redis] = None) -> Optional[TimelineBackend]:
+    if TIMELINE_BACKEND == "postgres":
+        return PostgresTimeline()
+    if TIMELINE_BACKEND == "redis":
+        return RedisTimeline(redis if redis is not None else get_redis())
+    return None
+
+
+@lru_cache
+def get_backend() -> Optional[TimelineBackend]:
+    return build_backend()
+
+
+async def enqueue(task_name: str, *args: int):
+    """Hand a timeline update to the Celery worker, off the request path."""
+
+    if get_backend() is None:
+        return
+
+    await background.send_task(task_name, *args)
+
+
+async def iter_follower_batches(session: AsyncSession, author_id: int):
+
+    last_id = 0
+    while True:
+        result = await session.execute(
+            select(FollowLink.follower_id)
+            .where(
+                FollowLink.followed_id == author_id, FollowLink.follower_id > last_id
+            )
+            .order_by(FollowLink.follower_id)
+            .limit(FANOUT_BATCH_SIZE)
+        )
+        batch = list(result.scalars().all())
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1]
+
+
+async def fan_out_tweet(
+    session: AsyncSession, backend: TimelineBackend, tweet_id: int, author_id: int
+):
+
+    author = await session.get(User, author_id)
+    if author is None or await session.get(Tweet, tweet_id) is None:
+        return
+
+    was_celebrity = author.is_celebrity
+    author.is_celebrity = author.followers_count >= CELEBRITY_FOLLOWER_THRESHOLD
+    if author.is_celebrity:
+        logger.info("Author {} is in pull mode, tweet {} skipped", author_id, tweet_id)
+        await session.commit()
+        return
+
+    tweet_ids = [tweet_id]
+    if was_celebrity:
+        # Автор вышел из режима pull: твиты того периода в лентах не лежат,
+        # а подтягиваться при чтении больше не будут
+        result = await session.execute(
+            select(Tweet.id)
+            .where(Tweet.user_id == author_id)
+            .order_by(Tweet.id.desc())
+            .limit(TIMELINE_BACKFILL)
+        )
+        tweet_ids = list(result.scalars().all())
+        logger.info(
+            "Author {} left pull mode, {} tweets backfilled", author_id, len(tweet_ids)
+        )
+
+    async for batch in iter_follower_batches(session, author_id):
+        await backend.add(session, batch, tweet_ids)
+
+    await session.commit()
+
+
+async def retract_tweet(
+    session: AsyncSession, backend: TimelineBackend, tweet_id: int, author_id: int
+):
+
+    if backend.cascades_on_delete:
+        return
+
+    async for batch in iter_follower_batches(session, author_id):
+        await backend.remove(session, batch, [tweet_id])
+
+
+async def retract_follow(
+    session: AsyncSession, backend: TimelineBackend, follower_id: int, followed_id: int
+):
+
+    last_id = 0
+    while True:
+        result = await session.execute(
+            select(Tweet.id)
+            .where(Tweet.user_id == followed_id, Tweet.id > last_id)
+            .order_by(Tweet.id)
+            .limit(FANOUT_BATCH_SIZE)
+        )
+        tweet_ids = list(result.scalars().all())
+        if not tweet_ids:
+            break
+        await backend.remove(session, [follower_id], tweet_ids)
+        last_id = tweet_ids[-1]
+
+    await session.commit()
+
+
+async def backfill_follow(
+    session: AsyncSession, backend: TimelineBackend, follower_id: int, followed_id: int
+):
+
+    followed = await session.get(User, followed_id)
+    if followed is None or followed.is_celebrity:
+        return
+
+    result = await session.execute(
+        select(Tweet.id)
+        .where(Tweet.user_id == followed_id)
+        .order_by(Tweet.id.desc())
+        .limit(TIMELINE_BACKFILL)
+    )
+    await backend.add(session, [follower_id], list(result.scalars().all()))
+
+    await session.commit()
@@ -0,0 +1,114 @@
+"""Feed serialization: pydantic response model vs row tuples + orjson."""
+
+import argparse
+import json
+import time
+from types import SimpleNamespace
+from typing import Callable
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from application import schemas
+from application.serializers import FeedRow, render_feed
+from application.thumbnails import variant_urls
+from core.config import THUMBNAIL_SIZES
+
+LIKES_PER_TWEET = 5
+MEDIA_PER_TWEET = 2
+
+
+def make_tweets(count: int) -> list[SimpleNamespace]:
+
+    users = [SimpleNamespace(id=i, name=f"user{i}") for i in range(1, 101)]
+    tweets = []
+    for i in range(count):
+        media = [
+            SimpleNamespace(path=f"/media/{i}_{j}.jpg", variants=list(THUMBNAIL_SIZES))
+            for j in range(MEDIA_PER_TWEET)
+        ]
+        tweets.append(
+            SimpleNamespace(
+                id=count - i,
+                tweet_data=f"tweet number {i} " * 4,
+                author=users[i % len(users)],
+                tweet_media_ids=media,
+                # Те же ссылки на копии, что отдает лента
+                attachment_variants=[
+                    variant_urls(item.path, item.variants) for item in media
+                ],
+                likes=users[i % 50 : i % 50 + LIKES_PER_TWEET],
+                likes_count=LIKES_PER_TWEET,
+            )
+        )
+    return tweets
+
+
+response_adapter: TypeAdapter = TypeAdapter(schemas.GetTweets | schemas.GetTweetCounts)
+
+
+def pydantic_path(tweets) -> bytes:
+    """What the endpoint did before: model_validate, then FastAPI's own pass."""
+
+    model = schemas.GetTweets.model_validate({"tweets": tweets, "next_cursor": None})
+    value = response_adapter.validate_python(model, from_attributes=True)
+    content = jsonable_encoder(
+        response_adapter.dump_python(value, mode="json", by_alias=True)
+    )
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def as_rows(tweets) -> list[FeedRow]:
+
+    return [
+        FeedRow(
+            tweet.id,
+            tweet.tweet_data,
+            tweet.author.id,
+            tweet.author.name,
+            [media.path for media in tweet.tweet_media_ids],
+            [media.variants for media in tweet.tweet_media_ids],
+            [{"user_id": user.id, "name": user.name} for user in tweet.likes],
+            tweet.likes_count,
+        )
+        for tweet in tweets
+    ]
+
+
+def orjson_path(rows) -> bytes:
+
+    return render_feed(rows, None)
+
+
+def best_of(func: Callable[[list], bytes], data, repeat: int) -> float:
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(data)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    args = parser.parse_args()
+
+    print(f"{'tweets':>8} {'pydantic, ms':>14} {'orjson, ms':>12} {'speedup':>8}")
+    for size in args.sizes:
+        tweets = make_tweets(size)
+        rows = as_rows(tweets)
+        assert json.loads(pydantic_path(tweets)) == json.loads(orjson_path(rows))
+
+        slow = best_of(pydantic_path, tweets, args.repeat)
+        fast = best_of(orjson_path, rows, args.repeat)
+        print(
+            f"{size:>8} {slow * 1000:>14.1f} {fast * 1000:>12.1f} {slow / fast:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ import os
 from celery import Celery
 from celery.signals import after_setup_logger
 
+from core.config import COUNTERS_RECONCILE_INTERVAL, MEDIA_GC_INTERVAL
 from logger_config import setup_logging
 
 # Получаем URL брокера из переменных окружения (те, что в docker-compose)
@@ -14,7 +15,7 @@ app = Celery(
     broker=CELERY_BROKER_URL,
     backend=CELERY_RESULT_BACKEND,
     # Указываем Celery, где искать задачи (автоматическое сканирование)
-    include=["financial_bot.tasks"],
+    include=["financial_bot.tasks", "application.tasks"],
 )
 
 # Дополнительные настройки ( сериализация и т.д.)
@@ -24,6 +25,18 @@ app.conf.update(
     result_serializer="json",
     timezone="UTC",
     enable_utc=True,
+    beat_schedule={
+        "reconcile-counters": {
+            "task": "application.tasks.reconcile_counters",
+            "schedule": COUNTERS_RECONCILE_INTERVAL,
+            "options": {"expires": COUNTERS_RECONCILE_INTERVAL},
+        },
+        "collect-media-garbage": {
+            "task": "application.tasks.collect_media_garbage",
+            "schedule": MEDIA_GC_INTERVAL,
+            "options": {"expires": MEDIA_GC_INTERVAL},
+        },
+    },
 )
 
 
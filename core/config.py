@@ -1,14 +1,54 @@
 import os
 from pathlib import Path
 
+
+def env_bool(name: str, default: bool = False) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def load_env_file(path: Path):
+    """Load `path` into the environment; python-dotenv is imported only if it exists."""
+
+    if path.is_file():
+        from dotenv import load_dotenv
+
+        load_dotenv(path)
+
+
 CURRENT_FILE = Path(__file__).resolve()
 BASE_DIR = CURRENT_FILE.parent.parent
 ROOT_DIR = BASE_DIR.parent
 
+# В контейнере переменные приходят из env_file compose, .env есть только локально
+load_env_file(BASE_DIR / ".env")
+
 STATIC_DIR = BASE_DIR / "static"
 MEDIA_DIR = BASE_DIR / "media"
 JS_DIR = STATIC_DIR / "js"
 CSS_DIR = STATIC_DIR / "css"
+# Период (с) перечитывания индекса STATIC_DIR, 0 — только при старте
+STATIC_INDEX_REFRESH = float(os.getenv("STATIC_INDEX_REFRESH", "0"))
+
+
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+# 0 — по числу доступных ядер с учетом квоты cgroup, но не больше SERVER_MAX_WORKERS:
+# каждый воркер держит до DB_POOL_SIZE + DB_MAX_OVERFLOW соединений с Postgres
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "0"))
+SERVER_MAX_WORKERS = int(os.getenv("SERVER_MAX_WORKERS", "8"))
+# Сколько секунд после SIGTERM ждать завершения текущих запросов
+SERVER_GRACEFUL_TIMEOUT = int(os.getenv("SERVER_GRACEFUL_TIMEOUT", "30"))
+SERVER_KEEP_ALIVE = int(os.getenv("SERVER_KEEP_ALIVE", "5"))
+
+
+def migrations_enabled() -> bool:
+    # Читается при старте приложения, а не при импорте: core.server накатывает
+    # миграции один раз и выключает их уже после импорта конфигурации, а при
+    # одном воркере uvicorn запускает приложение в том же процессе
+    return env_bool("RUN_MIGRATIONS", True)
 
 
 ALEMBIC_INI = BASE_DIR / "alembic.ini"
@@ -23,3 +63,83 @@ else:
 ALEMBIC_SCRIPTS = BASE_DIR / "migrations"
 
 TOKEN_BOT = os.getenv("BOT_TOKEN")
+
+FEED_PAGE_SIZE = int(os.getenv("FEED_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "100"))
+
+APP_REDIS_URL = os.getenv("APP_REDIS_URL", "redis://redis:6379/4")
+
+# "postgres" или "redis" включает материализованные ленты, пусто — чтение по подписке
+TIMELINE_BACKEND = os.getenv("TIMELINE_BACKEND", "")
+TIMELINE_MAX_LENGTH = int(os.getenv("TIMELINE_MAX_LENGTH", "800"))
+TIMELINE_BACKFILL = int(os.getenv("TIMELINE_BACKFILL", "200"))
+FANOUT_BATCH_SIZE = int(os.getenv("FANOUT_BATCH_SIZE", "1000"))
+CELEBRITY_FOLLOWER_THRESHOLD = int(os.getenv("CELEBRITY_FOLLOWER_THRESHOLD", "10000"))
+
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+
+# Срок кэша ответов; он же ограничивает устаревание ETag по версиям, поэтому
+# RESPONSE_CACHE_TTL <= 0 выключает и кэш, и версии
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "30"))
+# Кэш ответов ленты и профилей в Redis (APP_REDIS_URL), по умолчанию выключен
+RESPONSE_CACHE = env_bool("RESPONSE_CACHE") and RESPONSE_CACHE_TTL > 0
+# Счетчики версий в Redis: ETag без запросов к БД, кэшу ответов они нужны всегда
+RESPONSE_VERSIONS = (
+    env_bool("RESPONSE_VERSIONS") or RESPONSE_CACHE
+) and RESPONSE_CACHE_TTL > 0
+
+MEDIA_CHUNK_SIZE = int(os.getenv("MEDIA_CHUNK_SIZE", str(1024 * 1024)))
+MEDIA_MAX_SIZE = int(os.getenv("MEDIA_MAX_SIZE", str(50 * 1024 * 1024)))
+# Сколько файлов принимает POST /api/medias/batch за один запрос
+MEDIA_BATCH_MAX_FILES = int(os.getenv("MEDIA_BATCH_MAX_FILES", "10"))
+
+# "uuid" — случайное имя на каждую загрузку, "content" — имя по sha256 с дедупликацией
+MEDIA_STORAGE = os.getenv("MEDIA_STORAGE", "uuid")
+# Удаление файлов после коммита: размер пачки для потока, повторы и пауза между ними
+MEDIA_UNLINK_BATCH = int(os.getenv("MEDIA_UNLINK_BATCH", "100"))
+MEDIA_UNLINK_RETRIES = int(os.getenv("MEDIA_UNLINK_RETRIES", "3"))
+MEDIA_UNLINK_RETRY_DELAY = float(os.getenv("MEDIA_UNLINK_RETRY_DELAY", "0.5"))
+# Сборщик мусора медиа: возраст (с) непривязанных загрузок и файлов без записи,
+# размер пачки и период задачи Celery beat
+MEDIA_GC_MAX_AGE = float(os.getenv("MEDIA_GC_MAX_AGE", "86400"))
+MEDIA_GC_BATCH = int(os.getenv("MEDIA_GC_BATCH", "500"))
+MEDIA_GC_INTERVAL = float(os.getenv("MEDIA_GC_INTERVAL", "3600"))
+# Раздача медиа: срок кэширования (файлы не меняются) и внутренний location nginx
+# для X-Accel-Redirect; пусто — файлы отдает сам воркер
+MEDIA_CACHE_MAX_AGE = int(os.getenv("MEDIA_CACHE_MAX_AGE", "31536000"))
+MEDIA_ACCEL_REDIRECT = os.getenv("MEDIA_ACCEL_REDIRECT", "")
+# Уменьшенные копии изображений в WebP: стороны (px), качество и число процессов
+THUMBNAILS = env_bool("THUMBNAILS", True)
+THUMBNAIL_SIZES = tuple(
+    int(size) for size in os.getenv("THUMBNAIL_SIZES", "320,1080").split(",") if size
+)
+THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", "80"))
+THUMBNAIL_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", "2"))
+# Через сколько секунд снова пробовать уменьшить изображение, которое не удалось
+THUMBNAIL_RETRY_AFTER = float(os.getenv("THUMBNAIL_RETRY_AFTER", "3600"))
+THUMBNAIL_FAILED_SIZE = int(os.getenv("THUMBNAIL_FAILED_SIZE", "10000"))
+
+COUNTERS_RECONCILE_INTERVAL = float(os.getenv("COUNTERS_RECONCILE_INTERVAL", "3600"))
+
+PROFILE_PAGE_SIZE = int(os.getenv("PROFILE_PAGE_SIZE", "20"))
+
+DB_ECHO = env_bool("DB_ECHO")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Старые соединения закрывает pool_recycle; pre-ping — лишний запрос на каждую
+# выдачу из пула, включается только при обрывах соединений между БД и приложением
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = env_bool("DB_POOL_PRE_PING")
+# 0 — для PgBouncer в transaction-режиме
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+# Серверный statement_timeout в миллисекундах, 0 — без ограничения
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+
+# Сколько секунд после записи запросы пользователя читают с primary
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+REPLICA_STICKY_SIZE = int(os.getenv("REPLICA_STICKY_SIZE", "100000"))
+
+# Запросы дольше порога (мс) пишутся в лог вместе с маршрутом, 0 — отключено
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
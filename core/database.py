@@ -1,28 +1,268 @@
 import os
+import time
+from dataclasses import dataclass
+from hashlib import blake2b
+from typing import Any
 
-from dotenv import load_dotenv
+from fastapi import Request
+from loguru import logger
+from redis.exceptions import RedisError
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import (
     AsyncAttrs,
+    AsyncEngine,
     AsyncSession,
     async_sessionmaker,
     create_async_engine,
 )
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-load_dotenv()
+from core.config import (
+    DB_ECHO,
+    DB_MAX_OVERFLOW,
+    DB_POOL_PRE_PING,
+    DB_POOL_RECYCLE,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+    DB_STATEMENT_CACHE_SIZE,
+    DB_STATEMENT_TIMEOUT_MS,
+    REPLICA_STICKY_SECONDS,
+    REPLICA_STICKY_SIZE,
+    SLOW_QUERY_MS,
+)
+from core.metrics import DB_POOL_CHECKOUT_WAIT, request_stats
+from core.redis_client import get_redis
+from core.ttl_cache import TTLCache
 
 database_url = os.getenv("DATABASE_URL_DOCKER")
+replica_url = os.getenv("DATABASE_REPLICA_URL")
 
 if database_url is None:
     raise ValueError("DATABASE_URL_DOCKER is not set in environment variables")
-engine = create_async_engine(database_url, echo=True)
+
+
+@dataclass
+class PoolWaitStats:
+
+    checkouts: int = 0
+    wait_seconds_total: float = 0.0
+    wait_seconds_max: float = 0.0
+
+    def record(self, seconds: float):
+        self.checkouts += 1
+        self.wait_seconds_total += seconds
+        self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+        DB_POOL_CHECKOUT_WAIT.observe(seconds)
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that measures how long each checkout waits for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = PoolWaitStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.wait_stats.record(time.perf_counter() - start)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.wait_stats = self.wait_stats
+        return pool
+
+
+def engine_options() -> dict[str, Any]:
+
+    server_settings = {}
+    if DB_STATEMENT_TIMEOUT_MS:
+        server_settings["statement_timeout"] = str(DB_STATEMENT_TIMEOUT_MS)
+
+    return {
+        "echo": DB_ECHO,
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "connect_args": {
+            "statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+            "server_settings": server_settings,
+        },
+    }
+
+
+def pool_stats(db_engine: AsyncEngine) -> dict[str, float]:
+
+    pool = db_engine.pool
+    stats: dict[str, float] = {}
+    if isinstance(pool, InstrumentedQueuePool):
+        stats = {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "checkouts": pool.wait_stats.checkouts,
+            "wait_seconds_total": pool.wait_stats.wait_seconds_total,
+            "wait_seconds_max": pool.wait_stats.wait_seconds_max,
+        }
+
+    return stats
+
+
+def instrument(db_engine: AsyncEngine):
+    """Time every statement and log the ones slower than SLOW_QUERY_MS."""
+
+    sync_engine = db_engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def stop_timer(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+
+        stats = request_stats.get()
+        if stats is not None:
+            stats.query_seconds += elapsed
+
+        if SLOW_QUERY_MS and elapsed * 1000 >= SLOW_QUERY_MS:
+            logger.warning(
+                "Slow query {:.1f} ms, request {}: {}",
+                elapsed * 1000,
+                stats.route if stats is not None else "-",
+                statement,
+            )
+
+    @event.listens_for(sync_engine, "handle_error")
+    def drop_timer(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("query_start"):
+            connection.info["query_start"].pop()
+
+
+engine = create_async_engine(database_url, **engine_options())
+instrument(engine)
 async_session = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 
+replica_engine = (
+    create_async_engine(replica_url, **engine_options()) if replica_url else None
+)
+replica_session = (
+    async_sessionmaker(replica_engine, expire_on_commit=False, class_=AsyncSession)
+    if replica_engine is not None
+    else None
+)
+if replica_engine is not None:
+    instrument(replica_engine)
+
+READ_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+# api_key пользователей, недавно писавших в базу. Общий признак лежит в Redis,
+# чтобы чтение у другого воркера тоже ушло на primary; локальный кэш экономит
+# обращение к Redis, когда запрос попал в тот же процесс.
+recent_writers: TTLCache[str, bool] = TTLCache(
+    REPLICA_STICKY_SIZE, REPLICA_STICKY_SECONDS
+)
+
+
+def sticky_key(api_key: str) -> str:
+    # Сам api_key в именах ключей Redis не храним
+    return f"sticky:{blake2b(api_key.encode(), digest_size=16).hexdigest()}"
+
+
+async def mark_writer(api_key: str):
+
+    recent_writers.set(api_key, True)
+    try:
+        await get_redis().set(
+            sticky_key(api_key), 1, px=int(REPLICA_STICKY_SECONDS * 1000)
+        )
+    except RedisError as e:
+        logger.warning("Unable to share the read-your-writes window: {}", e)
+
+
+async def is_recent_writer(api_key: str) -> bool:
+
+    if recent_writers.get(api_key):
+        return True
+    try:
+        return bool(await get_redis().exists(sticky_key(api_key)))
+    except RedisError as e:
+        # Без Redis безопаснее читать с primary
+        logger.warning("Unable to check the read-your-writes window: {}", e)
+        return True
+
 
 class Base(AsyncAttrs, DeclarativeBase):
     pass
 
 
-async def get_db():
-    async with async_session() as session:
+async def choose_session_factory(
+    request: Request,
+) -> async_sessionmaker[AsyncSession]:
+    """Replica for reads, primary for writes and for recent writers' reads."""
+
+    if replica_session is None:
+        return async_session
+
+    if request.method not in READ_METHODS:
+        return async_session
+
+    api_key = request.headers.get("api-key")
+    if api_key and await is_recent_writer(api_key):
+        return async_session
+
+    return replica_session
+
+
+class ReadYourWrites:
+    """Open the read-your-writes window once a write request has succeeded."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+
+        api_key = None
+        if scope["type"] == "http" and scope["method"] not in READ_METHODS:
+            api_key = Headers(scope=scope).get("api-key")
+        if replica_session is None or not api_key:
+            await self.app(scope, receive, send)
+            return
+
+        async def marking_send(message: Message):
+            # Окно открывается после коммита записи, но до того, как клиент
+            # увидит ответ: долгая запись не съедает его целиком
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                await mark_writer(api_key)
+            await send(message)
+
+        await self.app(scope, receive, marking_send)
+
+
+async def get_db(request: Request):
+    async with (await choose_session_factory(request))() as session:
         yield session
+
+
+def engines() -> dict[str, AsyncEngine]:
+
+    named = {"primary": engine}
+    if replica_engine is not None:
+        named["replica"] = replica_engine
+
+    return named
+
+
+async def dispose_engines():
+    await engine.dispose()
+    if replica_engine is not None:
+        await replica_engine.dispose()
@@ -0,0 +1,90 @@
+"""Import-time profile of the API process."""
+
+import argparse
+import subprocess
+import sys
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Iterable
+
+from core.config import BASE_DIR
+
+
+@dataclass
+class ImportRecord:
+
+    name: str
+    self_us: int
+    cumulative_us: int
+
+
+def parse(lines: Iterable[str]) -> list[ImportRecord]:
+
+    records = []
+    for line in lines:
+        if not line.startswith("import time:"):
+            continue
+        fields = line.removeprefix("import time:").split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # заголовок таблицы
+        records.append(ImportRecord(fields[2].strip(), int(fields[0]), int(fields[1])))
+
+    return records
+
+
+def profile(module: str) -> list[ImportRecord]:
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=BASE_DIR,
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    return parse(result.stderr.splitlines())
+
+
+def package_totals(records: list[ImportRecord]) -> dict[str, int]:
+
+    totals: dict[str, int] = defaultdict(int)
+    for record in records:
+        totals[record.name.split(".")[0]] += record.self_us
+    return dict(totals)
+
+
+def summarize(records: list[ImportRecord], top: int) -> str:
+
+    total = sum(record.self_us for record in records)
+    lines = [
+        f"{len(records)} modules, {total / 1000:.1f} ms in total",
+        "",
+        f"{'self, ms':>9} {'cumulative, ms':>15}  module",
+    ]
+    for record in sorted(records, key=lambda r: r.self_us, reverse=True)[:top]:
+        lines.append(
+            f"{record.self_us / 1000:>9.1f} {record.cumulative_us / 1000:>15.1f}"
+            f"  {record.name}"
+        )
+
+    lines += ["", f"{'self, ms':>9} {'share':>6}  package"]
+    packages = sorted(package_totals(records).items(), key=lambda p: -p[1])
+    for package, self_us in packages[:top]:
+        lines.append(f"{self_us / 1000:>9.1f} {self_us / total:>6.1%}  {package}")
+
+    return "\n".join(lines)
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Summarize -X importtime")
+    parser.add_argument("module", nargs="?", default="main")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    print(summarize(profile(args.module), args.top))
+
+
+if __name__ == "__main__":
+    main()
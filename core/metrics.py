@@ -0,0 +1,113 @@
+"""Prometheus metrics of the API process."""
+
+import os
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import Scope
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests being processed",
+    multiprocess_mode="livesum",
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries",
+    "SQL statements executed per HTTP request",
+    ["method", "route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55),
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Connections of the SQLAlchemy pool",
+    ["engine", "state"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled connection",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "In-process and Redis cache lookups",
+    ["cache", "result"],
+)
+
+
+@dataclass
+class RequestStats:
+
+    route: str = ""
+    queries: int = 0
+    query_seconds: float = 0.0
+
+
+request_stats: ContextVar[Optional[RequestStats]] = ContextVar(
+    "request_stats", default=None
+)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def count_query(conn, cursor, statement, parameters, context, executemany):
+
+    stats = request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+
+
+def route_template(scope: Scope) -> str:
+    """Route path with placeholders, to keep label cardinality bounded."""
+
+    route = scope.get("route")
+    if route is not None:
+        return getattr(route, "path", "unmatched")
+
+    return scope.get("root_path") or "unmatched"
+
+
+def record_pool(engine_name: str, stats: dict[str, float]):
+
+    if not stats:
+        return
+
+    DB_POOL_CONNECTIONS.labels(engine_name, "in_use").set(stats["checked_out"])
+    DB_POOL_CONNECTIONS.labels(engine_name, "size").set(stats["size"])
+    DB_POOL_CONNECTIONS.labels(engine_name, "overflow").set(max(stats["overflow"], 0))
+
+
+def render_latest() -> tuple[bytes, str]:
+
+    # Несколько воркеров пишут выборки в PROMETHEUS_MULTIPROC_DIR, здесь они
+    # собираются вместе
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead():
+
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(os.getpid())
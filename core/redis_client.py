@@ -0,0 +1,16 @@
+from functools import lru_cache
+
+from redis.asyncio import Redis
+
+from core.config import APP_REDIS_URL
+
+
+@lru_cache
+def get_redis() -> Redis:
+    return Redis.from_url(APP_REDIS_URL)
+
+
+async def close_redis():
+    if get_redis.cache_info().currsize:
+        await get_redis().aclose()
+        get_redis.cache_clear()
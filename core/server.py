@@ -0,0 +1,139 @@
+"""Entry point of the API server."""
+
+import argparse
+import math
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Optional, Sequence
+
+import uvicorn
+
+from core.config import (
+    SERVER_GRACEFUL_TIMEOUT,
+    SERVER_HOST,
+    SERVER_KEEP_ALIVE,
+    SERVER_MAX_WORKERS,
+    SERVER_PORT,
+    SERVER_WORKERS,
+    migrations_enabled,
+)
+
+CGROUP_DIR = Path("/sys/fs/cgroup")
+
+
+def cgroup_cpu_quota(root: Path = CGROUP_DIR) -> Optional[float]:
+    """CPU limit of the container (`docker --cpus`), None when unlimited."""
+
+    try:
+        # cgroup v2: "max 100000" или "150000 100000"
+        quota, period = (root / "cpu.max").read_text().split()
+        if quota == "max":
+            return None
+        return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+
+    try:
+        # cgroup v1: -1 — без ограничения
+        quota_us = int((root / "cpu" / "cpu.cfs_quota_us").read_text())
+        period_us = int((root / "cpu" / "cpu.cfs_period_us").read_text())
+    except (OSError, ValueError):
+        return None
+    if quota_us <= 0 or period_us <= 0:
+        return None
+    return quota_us / period_us
+
+
+def available_cpus() -> int:
+
+    # Учитывают cpuset контейнера, в отличие от os.cpu_count()
+    if hasattr(os, "process_cpu_count"):
+        cpus = os.process_cpu_count() or 1
+    elif hasattr(os, "sched_getaffinity"):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+
+    # ... но не CFS-квоту: на большом хосте с --cpus=2 ядер видно все
+    quota = cgroup_cpu_quota()
+    if quota is not None:
+        cpus = min(cpus, max(1, math.ceil(quota)))
+    return cpus
+
+
+def default_workers() -> int:
+
+    return SERVER_WORKERS or min(available_cpus(), SERVER_MAX_WORKERS)
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+
+    parser = argparse.ArgumentParser(description="Clone-tweet API server")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=default_workers(),
+        help="worker processes, SERVER_WORKERS or the CPU limit",
+    )
+    parser.add_argument("--reload", action="store_true", help="development mode")
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--graceful-timeout", type=int, default=SERVER_GRACEFUL_TIMEOUT)
+    parser.add_argument("--keep-alive", type=int, default=SERVER_KEEP_ALIVE)
+
+    return parser.parse_args(argv)
+
+
+def prepare_multiprocess_metrics():
+    """Point prometheus_client of the workers at a clean shared directory."""
+
+    directory = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if directory:
+        # Файлы прошлого запуска дали бы чужие значения счетчиков
+        shutil.rmtree(directory, ignore_errors=True)
+        Path(directory).mkdir(parents=True, exist_ok=True)
+    else:
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="prometheus-")
+
+
+def run(argv: Optional[Sequence[str]] = None):
+
+    args = parse_args(argv)
+
+    if args.reload:
+        uvicorn.run(
+            "main:app",
+            host=args.host,
+            port=args.port,
+            reload=True,
+            log_level=args.log_level,
+        )
+        return
+
+    if migrations_enabled():
+        from migrations import utils
+
+        utils.run_upgrade()
+        os.environ["RUN_MIGRATIONS"] = "0"
+
+    if args.workers > 1:
+        prepare_multiprocess_metrics()
+
+    uvicorn.run(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop="uvloop",
+        http="httptools",
+        log_level=args.log_level,
+        timeout_keep_alive=args.keep_alive,
+        timeout_graceful_shutdown=args.graceful_timeout,
+    )
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,231 @@
+"""Precompressed static files and the in-memory SPA index."""
+
+import argparse
+import asyncio
+import gzip
+import mimetypes
+import os
+import re
+from hashlib import blake2b
+from pathlib import Path
+from typing import Iterable, Optional
+
+from anyio import to_thread
+from loguru import logger
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - сжатие brotli необязательно
+    brotli = None
+
+from core.config import STATIC_DIR
+
+# Имя с хешем содержимого от сборщика фронтенда: app.ee2cdef2.js
+HASHED_NAME = re.compile(r"\.[0-9a-f]{8,}\.\w+$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+# В порядке предпочтения
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+COMPRESSIBLE = {".js", ".css", ".map", ".html", ".svg", ".json", ".ico", ".txt"}
+MIN_SIZE = 1024
+
+
+def accepted_encodings(accept_encoding: str) -> set[str]:
+    """Codings of an Accept-Encoding header, without the `q=0` ones."""
+
+    accepted = set()
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        quality = params.strip().removeprefix("q=")
+        if not coding:
+            continue
+        try:
+            if params and float(quality) == 0:
+                continue
+        except ValueError:
+            continue
+        accepted.add(coding)
+
+    return accepted
+
+
+class PrecompressedStaticFiles(StaticFiles):
+
+    def compressed_sibling(
+        self, full_path: str, request_headers: Headers
+    ) -> Optional[tuple[str, str, os.stat_result]]:
+
+        accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+        for coding, suffix in ENCODINGS:
+            if coding not in accepted and "*" not in accepted:
+                continue
+            try:
+                stat_result = os.stat(f"{full_path}{suffix}")
+            except OSError:
+                continue
+            return coding, f"{full_path}{suffix}", stat_result
+
+        return None
+
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+
+        request_headers = Headers(scope=scope)
+        full_path = os.fspath(full_path)
+
+        sibling = self.compressed_sibling(full_path, request_headers)
+        if sibling is not None:
+            coding, compressed_path, compressed_stat = sibling
+            response = FileResponse(
+                compressed_path,
+                status_code=status_code,
+                stat_result=compressed_stat,
+                media_type=mimetypes.guess_type(full_path)[0] or "text/plain",
+                headers={"Content-Encoding": coding},
+            )
+        else:
+            response = FileResponse(
+                full_path, status_code=status_code, stat_result=stat_result
+            )
+
+        # Сжатый и исходный файлы имеют разные ETag, кэши должны их различать
+        response.headers["Vary"] = "Accept-Encoding"
+        if HASHED_NAME.search(full_path):
+            response.headers["Cache-Control"] = IMMUTABLE
+
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+class SpaIndex:
+    """Files of a static directory and its index.html, held in memory."""
+
+    def __init__(self, root: Path, index_name: str = "index.html"):
+        self.root = root
+        self.index_name = index_name
+        self.files: frozenset[str] = frozenset()
+        self.index_body: Optional[bytes] = None
+        self.index_etag = ""
+        self.signature: tuple = ()
+        self.build()
+
+    def scan_signature(self) -> tuple:
+        # mtime каталога меняется при добавлении и удалении файлов в нем
+        directories = [self.root, *(p for p in self.root.rglob("*") if p.is_dir())]
+        index = self.root / self.index_name
+        return (
+            tuple((str(d), d.stat().st_mtime_ns) for d in sorted(directories)),
+            index.stat().st_mtime_ns if index.is_file() else None,
+        )
+
+    def build(self):
+
+        signature = self.scan_signature()
+        files = frozenset(
+            path.relative_to(self.root).as_posix()
+            for path in self.root.rglob("*")
+            if path.is_file()
+        )
+        index = self.root / self.index_name
+        body = index.read_bytes() if index.is_file() else None
+
+        self.files = files
+        self.index_body = body
+        self.index_etag = (
+            f'"{blake2b(body, digest_size=16).hexdigest()}"' if body is not None else ""
+        )
+        self.signature = signature
+        logger.info("Static index of {}: {} files", self.root, len(files))
+
+    def refresh(self) -> bool:
+        """Rebuild when files were added, removed or index.html changed."""
+
+        if self.scan_signature() == self.signature:
+            return False
+        self.build()
+        return True
+
+    async def watch(self, interval: float):
+
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await to_thread.run_sync(self.refresh)
+            except OSError as e:
+                logger.error("Unable to refresh static index of {}: {}", self.root, e)
+
+    def lookup(self, path: str) -> Optional[Path]:
+        # Только пути из индекса: "../" и прочие обходы каталога сюда не попадут
+        return self.root / path if path in self.files else None
+
+    def index_response(self, if_none_match: Optional[str] = None) -> Response:
+
+        if self.index_body is None:
+            return Response(status_code=404)
+
+        headers = {"ETag": self.index_etag, "Cache-Control": "no-cache"}
+        if if_none_match and self.index_etag in (
+            tag.strip().removeprefix("W/") for tag in if_none_match.split(",")
+        ):
+            return Response(status_code=304, headers=headers)
+
+        return Response(self.index_body, media_type="text/html", headers=headers)
+
+
+def iter_assets(directory: Path) -> Iterable[Path]:
+
+    for path in sorted(directory.rglob("*")):
+        if path.is_file() and path.suffix in COMPRESSIBLE:
+            yield path
+
+
+def compress_tree(directory: Path) -> int:
+    """Write compressed siblings of the assets in `directory`, return their count."""
+
+    written = 0
+    for path in iter_assets(directory):
+        data = path.read_bytes()
+        if len(data) < MIN_SIZE:
+            continue
+
+        variants = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants[".br"] = brotli.compress(data, quality=11)
+
+        for suffix, compressed in variants.items():
+            # Сжатие не окупилось — отдаем исходный файл
+            if len(compressed) >= len(data):
+                continue
+            target = path.with_name(path.name + suffix)
+            target.write_bytes(compressed)
+            stat_result = path.stat()
+            os.utime(target, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns))
+            written += 1
+
+    return written
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Precompress static assets")
+    parser.add_argument("directories", nargs="*", type=Path, default=[STATIC_DIR])
+    args = parser.parse_args()
+
+    for directory in args.directories:
+        written = compress_tree(directory)
+        print(f"{directory}: {written} compressed files written")
+
+
+if __name__ == "__main__":
+    main()
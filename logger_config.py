@@ -2,10 +2,10 @@ import logging
 import os
 import sys
 
-from dotenv import load_dotenv
 from loguru import logger
 
-load_dotenv()
+# Загружает .env, если он есть, до чтения переменных ниже
+import core.config  # noqa: F401
 
 log_path = os.getenv("LOG_PATH", "logs")
 log_level = os.getenv("LOG_LEVEL", "DEBUG")
@@ -1,79 +1,128 @@
-import os
+import asyncio
 import time
 import traceback
 from contextlib import asynccontextmanager
 
-import uvicorn
 from anyio import to_thread
 from fastapi import FastAPI, Request
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, Response
 from loguru import logger
-from starlette.staticfiles import StaticFiles
 
+from application import thumbnails
 from application.exceptions import setup_exception_handlers
+from application.media import UploadSizeLimit
+from application.media_files import MediaFiles
 from application.routes import router
-from core.config import CSS_DIR, JS_DIR, MEDIA_DIR, STATIC_DIR
-from core.database import engine
+from core import metrics
+from core.config import (
+    CSS_DIR,
+    JS_DIR,
+    MEDIA_DIR,
+    STATIC_DIR,
+    STATIC_INDEX_REFRESH,
+    migrations_enabled,
+)
+from core.database import ReadYourWrites, dispose_engines, engines, pool_stats
+from core.redis_client import close_redis
+from core.static_files import PrecompressedStaticFiles, SpaIndex
 from logger_config import setup_logging
-from migrations import utils
 
 
 @asynccontextmanager
 async def lifespan(_: FastAPI):
 
-    await to_thread.run_sync(utils.run_upgrade)  # new
+    if migrations_enabled():
+        # alembic нужен только здесь: воркеры core.server его не импортируют
+        from migrations import utils
+
+        await to_thread.run_sync(utils.run_upgrade)  # new
+    watcher = None
+    if STATIC_INDEX_REFRESH:
+        watcher = asyncio.create_task(spa_index.watch(STATIC_INDEX_REFRESH))
 
     yield
 
-    await engine.dispose()
+    if watcher is not None:
+        watcher.cancel()
+    await dispose_engines()
+    await close_redis()
+    thumbnails.shutdown_pool()
+    metrics.mark_process_dead()
 
 
 setup_logging()
 
+spa_index = SpaIndex(STATIC_DIR)
+
 app = FastAPI(lifespan=lifespan)
 app.include_router(router)
+app.add_middleware(UploadSizeLimit)
+app.add_middleware(ReadYourWrites)
 setup_exception_handlers(app)
 
 
-app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
-app.mount("/js", StaticFiles(directory=str(JS_DIR)), name="js")
-app.mount("/css", StaticFiles(directory=str(CSS_DIR)), name="css")
-app.mount("/application/media", StaticFiles(directory=str(MEDIA_DIR)), name="media")
+app.mount("/static", PrecompressedStaticFiles(directory=str(STATIC_DIR)), name="static")
+app.mount("/js", PrecompressedStaticFiles(directory=str(JS_DIR)), name="js")
+app.mount("/css", PrecompressedStaticFiles(directory=str(CSS_DIR)), name="css")
+app.mount("/application/media", MediaFiles(directory=str(MEDIA_DIR)), name="media")
 
 
 @app.middleware("http")
 async def db_error_middleware(request: Request, call_next):
-    start_time = time.time()
+    start_time = time.perf_counter()
+    stats = metrics.RequestStats(route=f"{request.method} {request.url.path}")
+    token = metrics.request_stats.set(stats)
+    status_code = 500
+    metrics.REQUESTS_IN_FLIGHT.inc()
     try:
         response = await call_next(request)
-        process_time = time.time() - start_time
-        logger.debug(
-            "Request {} {} completed in {:.4f} s",
-            request.method,
-            request.url.path,
-            process_time,
-        )
+        status_code = response.status_code
         return response
     except Exception as e:  # noqa
         logger.exception("Internal Server Error: {}", e)
         traceback.print_exc()
         raise e
+    finally:
+        process_time = time.perf_counter() - start_time
+        route = metrics.route_template(request.scope)
+        metrics.REQUESTS_IN_FLIGHT.dec()
+        metrics.REQUEST_LATENCY.labels(request.method, route, status_code).observe(
+            process_time
+        )
+        metrics.REQUEST_QUERIES.labels(request.method, route).observe(stats.queries)
+        for name, db_engine in engines().items():
+            metrics.record_pool(name, pool_stats(db_engine))
+        metrics.request_stats.reset(token)
+        logger.debug(
+            "Request {} completed in {:.4f} s, {} queries in {:.4f} s",
+            stats.route,
+            process_time,
+            stats.queries,
+            stats.query_seconds,
+        )
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    body, content_type = metrics.render_latest()
+    return Response(content=body, media_type=content_type)
 
 
 @app.get("/{catchall:path}")
-async def serve_frontend(_: Request, catchall: str):
+async def serve_frontend(request: Request, catchall: str):
     if catchall.startswith("api/"):
         return JSONResponse(
             status_code=404, content={"result": False, "error": "API route not found"}
         )
 
-    file_path = os.path.join(STATIC_DIR, catchall)
-    if os.path.exists(file_path) and os.path.isfile(file_path):
+    file_path = spa_index.lookup(catchall)
+    if file_path is not None:
         return FileResponse(file_path)
 
-    return FileResponse(os.path.join(STATIC_DIR, "index.html"))
+    return spa_index.index_response(request.headers.get("if-none-match"))
 
 
 if __name__ == "__main__":
+    from core import server
 
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+    server.run()
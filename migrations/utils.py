@@ -1,17 +1,61 @@
 from alembic import command
 from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
 from loguru import logger
+from sqlalchemy import Connection, create_engine, func, select
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.pool import NullPool
 
 from core.config import ALEMBIC_INI, ALEMBIC_SCRIPTS, SYNC_URL_FOR_ALEMBIC
 
+# Ключ pg_advisory_lock: миграции накатывает один воркер из стартующих разом
+MIGRATION_LOCK_ID = 7_366_821_400_101
 
-def run_upgrade():
+
+def alembic_config() -> Config:
     alembic_cfg = Config(str(ALEMBIC_INI))
     alembic_cfg.set_main_option("sqlalchemy.url", str(SYNC_URL_FOR_ALEMBIC))  # new
     alembic_cfg.set_main_option("script_location", str(ALEMBIC_SCRIPTS))
+    return alembic_cfg
+
+
+def script_heads(alembic_cfg: Config) -> set[str]:
+    return set(ScriptDirectory.from_config(alembic_cfg).get_heads())
+
+
+def current_heads(connection: Connection) -> set[str]:
+
+    heads = set(MigrationContext.configure(connection).get_current_heads())
+    # Не держим транзакцию (и блокировку alembic_version) во время миграции
+    connection.rollback()
+    return heads
+
+
+def run_upgrade():
+    alembic_cfg = alembic_config()
+    engine = create_engine(str(SYNC_URL_FOR_ALEMBIC), poolclass=NullPool)
     try:
-        command.upgrade(alembic_cfg, "head")
-        logger.info("Migrations applied successfully")
+        with engine.connect() as connection:
+            expected = script_heads(alembic_cfg)
+            if current_heads(connection) == expected:
+                logger.info("Database schema is up to date")
+                return
+
+            # Блокировка сессионная, переживает rollback и снимается ниже
+            connection.execute(select(func.pg_advisory_lock(MIGRATION_LOCK_ID)))
+            try:
+                # Пока ждали блокировку, другой воркер мог все накатить
+                if current_heads(connection) == expected:
+                    logger.info("Migrations were applied by another worker")
+                    return
+
+                command.upgrade(alembic_cfg, "head")
+                logger.info("Migrations applied successfully")
+            finally:
+                connection.execute(select(func.pg_advisory_unlock(MIGRATION_LOCK_ID)))
+                connection.commit()
     except SQLAlchemyError as e:
         logger.error("Error running migrations: {}", e)
+    finally:
+        engine.dispose()
@@ -0,0 +1,53 @@
+# mypy: ignore-errors
+"""denormalized counters
+
+Revision ID: 2f6b8d14a9e3
+Revises: e7a4c2d9b180
+Create Date: 2026-10-17 13:41:08.902715
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "2f6b8d14a9e3"
+down_revision: Union[str, Sequence[str], None] = "e7a4c2d9b180"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "tweet",
+        sa.Column("likes_count", sa.Integer(), server_default="0", nullable=False),
+    )
+    op.add_column(
+        "users",
+        sa.Column("followers_count", sa.Integer(), server_default="0", nullable=False),
+    )
+    op.add_column(
+        "users",
+        sa.Column("following_count", sa.Integer(), server_default="0", nullable=False),
+    )
+    op.execute(
+        "UPDATE tweet SET likes_count = "
+        "(SELECT count(*) FROM likes WHERE likes.tweet_id = tweet.id)"
+    )
+    op.execute(
+        "UPDATE users SET "
+        "followers_count = "
+        "(SELECT count(*) FROM followers WHERE followers.followed_id = users.id), "
+        "following_count = "
+        "(SELECT count(*) FROM followers WHERE followers.follower_id = users.id)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("users", "following_count")
+    op.drop_column("users", "followers_count")
+    op.drop_column("tweet", "likes_count")
@@ -0,0 +1,28 @@
+# mypy: ignore-errors
+"""tweet feed keyset index
+
+Revision ID: 4b1f9e2a7c3d
+Revises: c174c71441de
+Create Date: 2026-10-17 10:12:41.208113
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "4b1f9e2a7c3d"
+down_revision: Union[str, Sequence[str], None] = "c174c71441de"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index("ix_tweet_user_id_id", "tweet", ["user_id", "id"], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_tweet_user_id_id", table_name="tweet")
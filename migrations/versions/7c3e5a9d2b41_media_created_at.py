@@ -0,0 +1,49 @@
+# mypy: ignore-errors
+"""media created_at
+
+Revision ID: 7c3e5a9d2b41
+Revises: 2f6b8d14a9e3
+Create Date: 2026-10-17 19:12:44.318027
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "7c3e5a9d2b41"
+down_revision: Union[str, Sequence[str], None] = "2f6b8d14a9e3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "media",
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+    )
+    op.create_index(
+        "ix_media_unattached_created_at",
+        "media",
+        ["created_at"],
+        unique=False,
+        postgresql_where="tweet_id IS NULL",
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        "ix_media_unattached_created_at",
+        table_name="media",
+        postgresql_where="tweet_id IS NULL",
+    )
+    op.drop_column("media", "created_at")
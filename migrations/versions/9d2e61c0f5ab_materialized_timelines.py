@@ -0,0 +1,54 @@
+# mypy: ignore-errors
+"""materialized timelines
+
+Revision ID: 9d2e61c0f5ab
+Revises: 4b1f9e2a7c3d
+Create Date: 2026-10-17 11:03:17.550920
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "9d2e61c0f5ab"
+down_revision: Union[str, Sequence[str], None] = "4b1f9e2a7c3d"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "timeline",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("tweet_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["tweet_id"], ["tweet.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("user_id", "tweet_id"),
+    )
+    op.create_index(
+        op.f("ix_timeline_tweet_id"), "timeline", ["tweet_id"], unique=False
+    )
+    op.create_index(
+        "ix_followers_followed_id_follower_id",
+        "followers",
+        ["followed_id", "follower_id"],
+        unique=False,
+    )
+    op.add_column(
+        "users",
+        sa.Column(
+            "is_celebrity", sa.Boolean(), server_default=sa.false(), nullable=False
+        ),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("users", "is_celebrity")
+    op.drop_index("ix_followers_followed_id_follower_id", table_name="followers")
+    op.drop_index(op.f("ix_timeline_tweet_id"), table_name="timeline")
+    op.drop_table("timeline")
@@ -0,0 +1,33 @@
+# mypy: ignore-errors
+"""media variants
+
+Revision ID: b81d4f6e2a07
+Revises: 7c3e5a9d2b41
+Create Date: 2026-10-17 21:40:18.527316
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "b81d4f6e2a07"
+down_revision: Union[str, Sequence[str], None] = "7c3e5a9d2b41"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "media",
+        sa.Column("variants", postgresql.ARRAY(sa.Integer()), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("media", "variants")
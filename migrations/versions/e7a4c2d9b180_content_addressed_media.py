@@ -0,0 +1,33 @@
+# mypy: ignore-errors
+"""content addressed media
+
+Revision ID: e7a4c2d9b180
+Revises: 9d2e61c0f5ab
+Create Date: 2026-10-17 12:26:50.114372
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e7a4c2d9b180"
+down_revision: Union[str, Sequence[str], None] = "9d2e61c0f5ab"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "media", sa.Column("content_hash", sa.String(length=64), nullable=True)
+    )
+    op.create_index(op.f("ix_media_path"), "media", ["path"], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_media_path"), table_name="media")
+    op.drop_column("media", "content_hash")
@@ -1,7 +1,9 @@
 import os
+from contextlib import contextmanager
 
 import pytest
 from redis.asyncio import Redis
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.pool.impl import NullPool
 
@@ -58,3 +60,33 @@ async def test_redis():
     yield redis
     await redis.flushdb()
     await redis.aclose()
+
+
+@pytest.fixture
+def query_budget():
+    """Fail the test when the wrapped block runs more SQL than declared.
+
+    with query_budget(5):
+        await client.get("/api/tweets", headers=headers)
+    """
+
+    @contextmanager
+    def budget(max_queries: int):
+        statements: list[str] = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(test_engine.sync_engine, "before_cursor_execute", record)
+        try:
+            yield statements
+        finally:
+            event.remove(test_engine.sync_engine, "before_cursor_execute", record)
+
+        assert (
+            len(statements) <= max_queries
+        ), f"{len(statements)} queries, budget is {max_queries}:\n" + "\n\n".join(
+            statements
+        )
+
+    return budget
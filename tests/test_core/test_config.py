@@ -0,0 +1,24 @@
+import os
+import subprocess
+import sys
+
+
+def test_zero_ttl_disables_response_cache():
+
+    env = {
+        **os.environ,
+        "RESPONSE_CACHE": "1",
+        "RESPONSE_VERSIONS": "1",
+        "RESPONSE_CACHE_TTL": "0",
+    }
+    # Конфигурация читается при импорте, поэтому в отдельном процессе
+    code = "from core import config as c; print(c.RESPONSE_CACHE, c.RESPONSE_VERSIONS)"
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    assert result.stdout.split() == ["False", "False"]
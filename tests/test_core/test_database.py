@@ -0,0 +1,119 @@
+import pytest
+from fastapi import Request
+from redis.exceptions import ConnectionError
+
+from core import database
+
+
+def make_request(method: str, api_key: str = "test") -> Request:
+    headers = [(b"api-key", api_key.encode())]
+    return Request({"type": "http", "method": method, "headers": headers})
+
+
+async def finish_write(api_key: str, status: int = 200, before_response=None):
+
+    async def app(scope, receive, send):
+        if before_response is not None:
+            await before_response()
+        await send({"type": "http.response.start", "status": status, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "headers": [(b"api-key", api_key.encode())],
+    }
+    await database.ReadYourWrites(app)(scope, receive, send)
+
+
+@pytest.fixture
+def replica(monkeypatch, test_redis):
+
+    replica_session = object()
+    monkeypatch.setattr(database, "replica_session", replica_session)
+    monkeypatch.setattr(database, "get_redis", lambda: test_redis)
+    database.recent_writers.clear()
+    yield replica_session
+    database.recent_writers.clear()
+
+
+async def test_reads_go_to_replica(replica):
+
+    assert await database.choose_session_factory(make_request("GET")) is replica
+
+
+async def test_writes_go_to_primary(replica):
+
+    factory = await database.choose_session_factory(make_request("POST"))
+
+    assert factory is database.async_session
+
+
+async def test_read_your_writes(replica):
+
+    await finish_write("writer")
+
+    writer = await database.choose_session_factory(
+        make_request("GET", api_key="writer")
+    )
+    other = await database.choose_session_factory(make_request("GET", api_key="reader"))
+
+    assert writer is database.async_session
+    assert other is replica
+
+
+async def test_read_your_writes_across_workers(replica):
+
+    await finish_write("writer")
+    # Следующий запрос пришел в другой воркер с пустым локальным кэшем
+    database.recent_writers.clear()
+
+    factory = await database.choose_session_factory(
+        make_request("GET", api_key="writer")
+    )
+
+    assert factory is database.async_session
+
+
+async def test_window_opens_when_write_responds(replica):
+
+    during = []
+
+    async def check_window():
+        during.append(await database.is_recent_writer("writer"))
+
+    await finish_write("writer", before_response=check_window)
+    await finish_write("failed", status=422)
+
+    # Пока запись идет, окно не открыто: его срок считается от ответа
+    assert during == [False]
+    assert await database.is_recent_writer("writer")
+    assert not await database.is_recent_writer("failed")
+
+
+async def test_redis_unavailable_reads_primary(replica, monkeypatch):
+
+    class BrokenRedis:
+        async def exists(self, *keys):
+            raise ConnectionError("down")
+
+    monkeypatch.setattr(database, "get_redis", BrokenRedis)
+
+    factory = await database.choose_session_factory(make_request("GET"))
+
+    assert factory is database.async_session
+
+
+async def test_no_replica_configured(monkeypatch):
+
+    monkeypatch.setattr(database, "replica_session", None)
+
+    factory = await database.choose_session_factory(make_request("GET"))
+
+    assert factory is database.async_session
@@ -0,0 +1,21 @@
+from core import importtime
+
+LOG = """\
+import time: self [us] | cumulative | imported package
+import time:       189 |        628 |           orjson
+import time:      3026 |     199289 |     sqlalchemy
+import time:       294 |      51521 |           sqlalchemy.sql
+"""
+
+
+def test_parse_and_summarize():
+
+    records = importtime.parse(LOG.splitlines())
+
+    assert [record.name for record in records] == [
+        "orjson",
+        "sqlalchemy",
+        "sqlalchemy.sql",
+    ]
+    assert importtime.package_totals(records) == {"orjson": 189, "sqlalchemy": 3320}
+    assert importtime.summarize(records, top=1).splitlines()[3].endswith("sqlalchemy")
@@ -0,0 +1,46 @@
+import os
+
+import pytest
+
+from migrations import utils
+
+
+@pytest.fixture
+def upgrades(monkeypatch):
+
+    calls = []
+    test_url = os.environ["TEST_DATABASE_URL"].replace("+asyncpg", "")
+    monkeypatch.setattr(utils, "SYNC_URL_FOR_ALEMBIC", test_url)
+    monkeypatch.setattr(utils.command, "upgrade", lambda *args: calls.append(args))
+    return calls
+
+
+def test_skips_upgrade_at_head(monkeypatch, upgrades):
+
+    heads = utils.script_heads(utils.alembic_config())
+    monkeypatch.setattr(utils, "current_heads", lambda connection: heads)
+
+    utils.run_upgrade()
+
+    assert upgrades == []
+
+
+def test_rechecks_heads_under_lock(monkeypatch, upgrades):
+
+    heads = utils.script_heads(utils.alembic_config())
+    # Первая проверка до блокировки, вторая — после: схему успел накатить сосед
+    answers = iter([set(), heads])
+    monkeypatch.setattr(utils, "current_heads", lambda connection: next(answers))
+
+    utils.run_upgrade()
+
+    assert upgrades == []
+
+
+def test_upgrades_behind_head(monkeypatch, upgrades):
+
+    monkeypatch.setattr(utils, "current_heads", lambda connection: set())
+
+    utils.run_upgrade()
+
+    assert len(upgrades) == 1
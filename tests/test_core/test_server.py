@@ -0,0 +1,79 @@
+import os
+
+from core import server
+from core.config import migrations_enabled
+
+
+def test_parse_args_defaults():
+
+    args = server.parse_args([])
+
+    assert args.workers == server.default_workers()
+    assert not args.reload
+    assert args.graceful_timeout == server.SERVER_GRACEFUL_TIMEOUT
+
+
+def test_multiprocess_metrics_dir_is_cleaned(monkeypatch, tmp_path):
+
+    directory = tmp_path / "prometheus"
+    directory.mkdir()
+    (directory / "counter_1.db").write_bytes(b"stale")
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(directory))
+
+    server.prepare_multiprocess_metrics()
+
+    assert os.listdir(directory) == []
+
+
+def test_cgroup_v2_quota(tmp_path):
+
+    (tmp_path / "cpu.max").write_text("150000 100000\n")
+
+    assert server.cgroup_cpu_quota(tmp_path) == 1.5
+
+
+def test_cgroup_unlimited(tmp_path):
+
+    (tmp_path / "cpu.max").write_text("max 100000\n")
+
+    assert server.cgroup_cpu_quota(tmp_path) is None
+
+
+def test_cgroup_v1_quota(tmp_path):
+
+    (tmp_path / "cpu").mkdir()
+    (tmp_path / "cpu" / "cpu.cfs_quota_us").write_text("200000\n")
+    (tmp_path / "cpu" / "cpu.cfs_period_us").write_text("100000\n")
+
+    assert server.cgroup_cpu_quota(tmp_path) == 2
+
+
+def test_workers_follow_quota(monkeypatch):
+
+    # Хост на 32 ядра, контейнер с --cpus=1.5
+    monkeypatch.setattr(server.os, "process_cpu_count", lambda: 32, raising=False)
+    monkeypatch.setattr(server.os, "sched_getaffinity", lambda pid: set(range(32)))
+    monkeypatch.setattr(server, "cgroup_cpu_quota", lambda: 1.5)
+    monkeypatch.setattr(server, "SERVER_WORKERS", 0)
+    monkeypatch.setattr(server, "SERVER_MAX_WORKERS", 64)
+
+    assert server.default_workers() == 2
+
+
+def test_single_worker_skips_lifespan_migrations(monkeypatch):
+
+    from migrations import utils
+
+    upgrades = []
+    seen = []
+    monkeypatch.setenv("RUN_MIGRATIONS", "1")
+    monkeypatch.setattr(utils, "run_upgrade", lambda: upgrades.append(1))
+    # С одним воркером приложение стартует в этом же процессе
+    monkeypatch.setattr(
+        server.uvicorn, "run", lambda *a, **kw: seen.append(migrations_enabled())
+    )
+
+    server.run(["--workers", "1"])
+
+    assert upgrades == [1]
+    assert seen == [False]
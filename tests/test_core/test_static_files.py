@@ -0,0 +1,126 @@
+import pytest
+from httpx import ASGITransport, AsyncClient
+from starlette.applications import Starlette
+from starlette.routing import Mount
+
+from core import static_files
+
+BUNDLE = b"console.log('clone tweet');\n" * 200
+
+
+@pytest.fixture
+async def static_client(tmp_path):
+
+    (tmp_path / "app.ee2cdef2.js").write_bytes(BUNDLE)
+    (tmp_path / "favicon.txt").write_bytes(BUNDLE)
+    static_files.compress_tree(tmp_path)
+
+    app = Starlette(
+        routes=[
+            Mount("/js", app=static_files.PrecompressedStaticFiles(directory=tmp_path))
+        ]
+    )
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        yield client
+
+
+@pytest.mark.skipif(static_files.brotli is None, reason="Brotli is not installed")
+async def test_serves_brotli(static_client):
+
+    response = await static_client.get(
+        "/js/app.ee2cdef2.js", headers={"accept-encoding": "gzip, br"}
+    )
+
+    assert response.headers["content-encoding"] == "br"
+    assert response.headers["content-type"].startswith("text/javascript")
+    assert response.content == BUNDLE
+
+
+async def test_serves_gzip(static_client):
+
+    response = await static_client.get(
+        "/js/app.ee2cdef2.js", headers={"accept-encoding": "gzip, br;q=0"}
+    )
+    raw = await static_client.get(
+        "/js/app.ee2cdef2.js", headers={"accept-encoding": "identity"}
+    )
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert int(response.headers["content-length"]) < len(BUNDLE)
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.content == BUNDLE
+    assert "content-encoding" not in raw.headers
+    assert raw.content == BUNDLE
+
+
+async def test_cache_headers(static_client):
+
+    hashed = await static_client.get("/js/app.ee2cdef2.js")
+    plain = await static_client.get("/js/favicon.txt")
+
+    assert hashed.headers["cache-control"] == static_files.IMMUTABLE
+    assert "cache-control" not in plain.headers
+
+
+async def test_not_modified(static_client):
+
+    headers = {"accept-encoding": "gzip"}
+    response = await static_client.get("/js/app.ee2cdef2.js", headers=headers)
+    response = await static_client.get(
+        "/js/app.ee2cdef2.js",
+        headers={**headers, "if-none-match": response.headers["etag"]},
+    )
+
+    assert response.status_code == 304
+    assert response.headers["cache-control"] == static_files.IMMUTABLE
+
+
+def test_accepted_encodings():
+
+    assert static_files.accepted_encodings("gzip;q=0.5, br;q=0, deflate") == {
+        "gzip",
+        "deflate",
+    }
+
+
+@pytest.fixture
+def spa_root(tmp_path):
+
+    (tmp_path / "js").mkdir()
+    (tmp_path / "js" / "app.ee2cdef2.js").write_bytes(BUNDLE)
+    (tmp_path / "index.html").write_bytes(b"<html></html>")
+    (tmp_path.parent / "secret.txt").write_bytes(b"secret")
+    return tmp_path
+
+
+def test_spa_index_lookup(spa_root):
+
+    index = static_files.SpaIndex(spa_root)
+
+    assert index.lookup("js/app.ee2cdef2.js") == spa_root / "js" / "app.ee2cdef2.js"
+    assert index.lookup("profile/2") is None
+    assert index.lookup("../secret.txt") is None
+
+
+def test_spa_index_response(spa_root):
+
+    index = static_files.SpaIndex(spa_root)
+    response = index.index_response()
+    not_modified = index.index_response(response.headers["etag"])
+
+    assert response.body == b"<html></html>"
+    assert response.headers["content-type"].startswith("text/html")
+    assert not_modified.status_code == 304
+
+
+def test_spa_index_refresh(spa_root):
+
+    index = static_files.SpaIndex(spa_root)
+    assert not index.refresh()
+
+    (spa_root / "js" / "chunk-0420bcc4.11441662.js").write_bytes(BUNDLE)
+
+    assert index.refresh()
+    assert index.lookup("js/chunk-0420bcc4.11441662.js") is not None
@@ -6,9 +6,17 @@ from httpx import ASGITransport, AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from application import models
+from application.auth import auth_cache
 from main import app
 
 
+@pytest.fixture(autouse=True)
+def clear_auth_cache():
+    auth_cache.clear()
+    yield
+    auth_cache.clear()
+
+
 @pytest.fixture(scope="function")
 async def client():
     async with AsyncClient(
@@ -33,7 +41,9 @@ async def second_user(test_session: AsyncSession, first_user):
     new_user = models.User(
         api_key="user",
         name="second_user",
+        following_count=1,
     )
+    first_user.followers_count += 1
 
     test_session.add(new_user)
     await test_session.flush()
@@ -77,6 +87,7 @@ async def test_tweet_with_media(
 async def create_like(test_session: AsyncSession, test_tweet_with_media, second_user):
 
     new_like = models.Likes(user_id=second_user.id, tweet_id=test_tweet_with_media.id)
+    test_tweet_with_media.likes_count += 1
 
     test_session.add(new_like)
     await test_session.flush()
@@ -91,6 +102,8 @@ async def follow(test_session: AsyncSession, first_user, second_user):
     new_follow = models.FollowLink(
         follower_id=first_user.id, followed_id=second_user.id
     )
+    first_user.following_count += 1
+    second_user.followers_count += 1
     test_session.add(new_follow)
     await test_session.flush()
     await test_session.refresh(new_follow)
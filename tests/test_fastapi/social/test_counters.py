@@ -0,0 +1,83 @@
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from application.crud.counters import reconcile_counters
+
+
+async def test_like_counter(
+    client: AsyncClient, test_session: AsyncSession, first_user, test_tweet_with_media
+):
+
+    headers = {"api-key": first_user.api_key}
+    url = f"/api/tweets/{test_tweet_with_media.id}/likes"
+
+    await client.post(url, headers=headers)
+    await test_session.refresh(test_tweet_with_media)
+    assert test_tweet_with_media.likes_count == 1
+
+    await client.delete(url, headers=headers)
+    await test_session.refresh(test_tweet_with_media)
+    assert test_tweet_with_media.likes_count == 0
+
+
+async def test_follow_counters(
+    client: AsyncClient, test_session: AsyncSession, first_user, second_user
+):
+
+    headers = {"api-key": first_user.api_key}
+    await client.post(f"/api/users/{second_user.id}/follow", headers=headers)
+
+    response = await client.get(
+        f"/api/users/{second_user.id}",
+        headers=headers,
+        params={"counts_only": True},
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "result": True,
+        "user": {
+            "id": second_user.id,
+            "name": second_user.name,
+            "followers_count": 1,
+            "following_count": 1,
+        },
+    }
+
+
+async def test_feed_counts_only(
+    client: AsyncClient,
+    test_session: AsyncSession,
+    second_user,
+    test_tweet_with_media,
+    create_like,
+):
+
+    response = await client.get(
+        "/api/tweets",
+        headers={"api-key": second_user.api_key},
+        params={"counts_only": True},
+    )
+    tweet = response.json()["tweets"][0]
+
+    assert response.status_code == 200
+    assert tweet["likes_count"] == 1
+    assert "likes" not in tweet
+
+
+async def test_reconcile_counters(
+    test_session: AsyncSession, first_user, second_user, create_like
+):
+
+    first_user.followers_count = 5
+    second_user.following_count = 0
+    await test_session.flush()
+
+    fixed = await reconcile_counters(test_session)
+    for obj in (first_user, second_user):
+        await test_session.refresh(obj)
+
+    assert fixed == 2
+    assert first_user.followers_count == 1
+    assert second_user.following_count == 1
+    assert await reconcile_counters(test_session) == 0
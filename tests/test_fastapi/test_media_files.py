@@ -0,0 +1,79 @@
+import hashlib
+import io
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from PIL import Image
+from starlette.applications import Starlette
+from starlette.routing import Mount
+
+from application import media_files, thumbnails
+
+VIDEO = bytes(range(256)) * 64
+DIGEST = hashlib.sha256(VIDEO).hexdigest()
+
+
+@pytest.fixture
+async def media_client(tmp_path):
+
+    (tmp_path / "clip.mp4").write_bytes(VIDEO)
+    shard = tmp_path / DIGEST[:2] / DIGEST[2:4]
+    shard.mkdir(parents=True)
+    (shard / f"{DIGEST}.mp4").write_bytes(VIDEO)
+
+    app = Starlette(
+        routes=[Mount("/media", app=media_files.MediaFiles(directory=tmp_path))]
+    )
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        yield client
+
+
+async def test_range_request(media_client):
+
+    response = await media_client.get(
+        "/media/clip.mp4", headers={"range": "bytes=10-19"}
+    )
+
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes 10-19/{len(VIDEO)}"
+    assert response.content == VIDEO[10:20]
+
+
+async def test_content_hash_etag(media_client):
+
+    url = f"/media/{DIGEST[:2]}/{DIGEST[2:4]}/{DIGEST}.mp4"
+    response = await media_client.get(url)
+    cached = await media_client.get(url, headers={"if-none-match": f'"{DIGEST}"'})
+
+    assert response.headers["etag"] == f'"{DIGEST}"'
+    assert "immutable" in response.headers["cache-control"]
+    assert cached.status_code == 304
+
+
+async def test_accel_redirect(media_client, monkeypatch):
+
+    monkeypatch.setattr(media_files, "MEDIA_ACCEL_REDIRECT", "/_media/")
+
+    response = await media_client.get("/media/clip.mp4")
+
+    assert response.status_code == 200
+    assert response.headers["x-accel-redirect"] == "/_media/clip.mp4"
+    assert response.content == b""
+
+
+async def test_renders_missing_variant(media_client, tmp_path, monkeypatch):
+
+    monkeypatch.setattr(thumbnails, "THUMBNAIL_SIZES", (320,))
+    monkeypatch.setattr(media_files, "THUMBNAIL_SIZES", (320,))
+    buffer = io.BytesIO()
+    Image.new("RGB", (640, 480), "teal").save(buffer, "PNG")
+    (tmp_path / "photo.png").write_bytes(buffer.getvalue())
+
+    response = await media_client.get("/media/photo.png.320.webp")
+    unknown = await media_client.get("/media/photo.png.500.webp")
+
+    assert response.status_code == 200
+    assert Image.open(io.BytesIO(response.content)).size == (320, 240)
+    assert unknown.status_code == 404
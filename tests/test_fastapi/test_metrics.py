@@ -0,0 +1,30 @@
+from httpx import AsyncClient
+from prometheus_client import REGISTRY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+async def test_metrics_endpoint(
+    client: AsyncClient, test_session: AsyncSession, second_user
+):
+
+    labels = {"method": "GET", "route": "/api/tweets"}
+    requests_before = sample(
+        "http_request_duration_seconds_count", status="200", **labels
+    )
+    queries_before = sample("http_request_db_queries_sum", **labels)
+
+    await client.get("/api/tweets", headers={"api-key": second_user.api_key})
+    response = await client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "http_requests_in_flight" in response.text
+    assert (
+        sample("http_request_duration_seconds_count", status="200", **labels)
+        == requests_before + 1
+    )
+    assert sample("http_request_db_queries_sum", **labels) > queries_before
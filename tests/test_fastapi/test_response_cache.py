@@ -0,0 +1,208 @@
+import asyncio
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from application import background, response_cache, timeline
+
+
+@pytest.fixture
+def versions(monkeypatch, test_redis):
+
+    versions = response_cache.VersionStore(test_redis)
+    monkeypatch.setattr(response_cache, "get_versions", lambda: versions)
+    return versions
+
+
+@pytest.fixture
+def worker(monkeypatch, test_session: AsyncSession, versions):
+    """Collects sent tasks; `await worker()` runs the invalidations inline."""
+
+    sent = []
+
+    async def fake_send_task(task_name, *args):
+        sent.append((task_name, *args))
+
+    async def run():
+        while sent:
+            task_name, *args = sent.pop(0)
+            if task_name == "invalidate_author_feeds":
+                await response_cache.bump_author_feeds(test_session, versions, *args)
+
+    monkeypatch.setattr(background, "send_task", fake_send_task)
+    run.sent = sent  # type: ignore[attr-defined]
+    return run
+
+
+@pytest.fixture
+def cache(monkeypatch, test_redis, versions):
+
+    cache = response_cache.ResponseCache(test_redis)
+    monkeypatch.setattr(response_cache, "get_cache", lambda: cache)
+    return cache
+
+
+async def test_feed_is_cached(
+    client: AsyncClient,
+    test_session: AsyncSession,
+    cache,
+    second_user,
+    test_tweet_with_media,
+    query_budget,
+):
+
+    headers = {"api-key": second_user.api_key}
+    first = await client.get("/api/tweets", headers=headers)
+    with query_budget(0):
+        second = await client.get("/api/tweets", headers=headers)
+
+    assert second.status_code == 200
+    assert second.content == first.content
+
+
+async def test_feed_invalidated_by_writes(
+    client: AsyncClient,
+    test_session: AsyncSession,
+    cache,
+    worker,
+    first_user,
+    second_user,
+    test_tweet_with_media,
+):
+
+    headers = {"api-key": second_user.api_key}
+    await client.get("/api/tweets", headers=headers)
+
+    response = await client.post(
+        "/api/tweets",
+        json={"tweet_data": "fresh"},
+        headers={"api-key": first_user.api_key},
+    )
+    tweet_id = response.json()["tweet_id"]
+    await client.post(f"/api/tweets/{tweet_id}/likes", headers=headers)
+    await worker()
+
+    response = await client.get("/api/tweets", headers=headers)
+    tweets = response.json()["tweets"]
+
+    assert [tweet["id"] for tweet in tweets] == [tweet_id, test_tweet_with_media.id]
+    assert tweets[0]["likes"] == [{"user_id": second_user.id, "name": second_user.name}]
+
+
+async def test_profile_invalidated_by_follow(
+    client: AsyncClient, test_session: AsyncSession, cache, first_user, second_user
+):
+
+    headers = {"api-key": second_user.api_key}
+    response = await client.get(f"/api/users/{first_user.id}", headers=headers)
+    assert response.json()["user"]["followers_count"] == 1
+
+    await client.delete(f"/api/users/{first_user.id}/follow", headers=headers)
+    response = await client.get(f"/api/users/{first_user.id}", headers=headers)
+
+    assert response.json()["user"]["followers_count"] == 0
+    assert response.json()["user"]["followers"] == []
+
+
+async def test_concurrent_misses_render_once(cache):
+
+    calls = 0
+
+    async def render() -> bytes:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return b"{}"
+
+    bodies = await asyncio.gather(
+        *(cache.fetch("feed", 1, 0, "page", render) for _ in range(5))
+    )
+
+    assert bodies == [b"{}"] * 5
+    assert calls == 1
+
+
+async def test_feed_not_modified(
+    client: AsyncClient,
+    test_session: AsyncSession,
+    versions,
+    worker,
+    first_user,
+    second_user,
+    test_tweet_with_media,
+    query_budget,
+):
+
+    headers = {"api-key": second_user.api_key}
+    response = await client.get("/api/tweets", headers=headers)
+    etag = response.headers["etag"]
+
+    with query_budget(0):
+        response = await client.get(
+            "/api/tweets", headers={**headers, "if-none-match": etag}
+        )
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert response.content == b""
+
+    await client.post(
+        "/api/tweets",
+        json={"tweet_data": "fresh"},
+        headers={"api-key": first_user.api_key},
+    )
+    await worker()
+    response = await client.get(
+        "/api/tweets", headers={**headers, "if-none-match": etag}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+async def test_body_etag_without_versions(
+    client: AsyncClient, test_session: AsyncSession, first_user
+):
+
+    headers = {"api-key": first_user.api_key}
+    response = await client.get("/api/users/me", headers=headers)
+    etag = response.headers["etag"]
+
+    response = await client.get(
+        "/api/users/me", headers={**headers, "if-none-match": f'W/"other", {etag}'}
+    )
+
+    assert response.status_code == 304
+
+
+async def test_feed_bumped_after_fan_out(
+    client: AsyncClient,
+    test_session: AsyncSession,
+    monkeypatch,
+    cache,
+    versions,
+    worker,
+    first_user,
+    second_user,
+):
+
+    backend = timeline.PostgresTimeline()
+    monkeypatch.setattr(timeline, "get_backend", lambda: backend)
+    headers = {"api-key": second_user.api_key}
+    await client.get("/api/tweets", headers=headers)
+
+    response = await client.post(
+        "/api/tweets",
+        json={"tweet_data": "fan out"},
+        headers={"api-key": first_user.api_key},
+    )
+    tweet_id = response.json()["tweet_id"]
+    # До fan-out версия прежняя: чтение не закэширует ленту без твита под новой
+    assert await versions.current("feed", second_user.id) == 0
+    assert worker.sent == [("fan_out_tweet", tweet_id, first_user.id)]
+
+    await timeline.fan_out_tweet(test_session, backend, tweet_id, first_user.id)
+    await response_cache.bump_author_feeds(test_session, versions, first_user.id)
+    response = await client.get("/api/tweets", headers=headers)
+
+    assert [tweet["id"] for tweet in response.json()["tweets"]] == [tweet_id]
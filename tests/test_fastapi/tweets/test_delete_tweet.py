@@ -6,7 +6,8 @@ from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from application import models
+from application import media, models
+from application.crud.tweets import remove_unused_files
 
 
 async def test_delete_tweet(
@@ -67,3 +68,43 @@ async def test_delete_tweet_integrity_error(
 
         assert response.status_code == 400
         assert "Entry does not exist." in response.json()["detail"]
+
+    media_list = await test_tweet_with_media.awaitable_attrs.tweet_media_ids
+    assert os.path.exists(media_list[0].path)
+
+
+async def test_unlink_files_retries(monkeypatch, tmp_path):
+
+    files = [tmp_path / f"{i}.jpg" for i in range(3)]
+    for path in files:
+        path.write_bytes(b"data")
+    busy = {str(files[0])}
+    real_remove = os.remove
+
+    def flaky_remove(path):
+        if path in busy:
+            busy.discard(path)
+            raise PermissionError(path)
+        real_remove(path)
+
+    monkeypatch.setattr(media.os, "remove", flaky_remove)
+
+    await media.unlink_files([str(path) for path in files], batch_size=2, retry_delay=0)
+
+    assert not any(path.exists() for path in files)
+
+
+async def test_reupload_keeps_file(test_session: AsyncSession, tmp_path):
+
+    # Тот же файл загрузили заново между удалением твита и удалением файлов
+    reused = tmp_path / "same-bytes.jpg"
+    unused = tmp_path / "unused.jpg"
+    for path in (reused, unused):
+        path.write_bytes(b"data")
+    test_session.add(models.Media(path=str(reused)))
+    await test_session.flush()
+
+    await remove_unused_files(test_session, [str(reused), str(unused)])
+
+    assert reused.exists()
+    assert not unused.exists()
@@ -1,6 +1,10 @@
 from httpx import AsyncClient
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from application import models
+from application.pagination import encode_cursor
+
 
 async def test_tweet_feed(
     client: AsyncClient,
@@ -9,10 +13,26 @@ async def test_tweet_feed(
     test_tweet_with_media,
     second_user,
     create_like,
+    query_budget,
 ):
 
+    # В ленте только уже отрисованные копии
+    await test_session.execute(
+        update(models.Media)
+        .where(models.Media.tweet_id == test_tweet_with_media.id)
+        .values(variants=[320])
+    )
     headers = {"api-key": "user"}
-    response = await client.get("/api/tweets", headers=headers)
+    # пользователь и один запрос ленты с агрегатами медиа и лайков
+    with query_budget(2):
+        response = await client.get("/api/tweets", headers=headers)
+
+    result = await test_session.execute(
+        select(models.Media.path)
+        .where(models.Media.tweet_id == test_tweet_with_media.id)
+        .order_by(models.Media.id)
+    )
+    attachments = list(result.scalars().all())
 
     answer = {
         "result": True,
@@ -20,14 +40,77 @@ async def test_tweet_feed(
             {
                 "id": test_tweet_with_media.id,
                 "content": test_tweet_with_media.tweet_data,
-                "attachments": [
-                    media.path for media in test_tweet_with_media.tweet_media_ids
+                "attachments": attachments,
+                "attachment_variants": [
+                    {"320": f"{path}.320.webp"} for path in attachments
                 ],
                 "author": {"id": first_user.id, "name": first_user.name},
                 "likes": [{"user_id": second_user.id, "name": second_user.name}],
             }
         ],
+        "next_cursor": None,
     }
 
     assert response.status_code == 200
     assert response.json() == answer
+
+
+async def test_tweet_feed_pagination(
+    client: AsyncClient, test_session: AsyncSession, first_user, second_user
+):
+
+    tweets = [
+        models.Tweet(user_id=first_user.id, tweet_data=f"tweet {i}") for i in range(5)
+    ]
+    test_session.add_all(tweets)
+    await test_session.flush()
+    expected_ids = sorted((tweet.id for tweet in tweets), reverse=True)
+
+    headers = {"api-key": "user"}
+    received_ids: list[int] = []
+    cursor = None
+    pages = 0
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = await client.get("/api/tweets", headers=headers, params=params)
+        assert response.status_code == 200
+
+        body = response.json()
+        assert len(body["tweets"]) <= 2
+        received_ids.extend(tweet["id"] for tweet in body["tweets"])
+        pages += 1
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+
+    assert pages == 3
+    assert received_ids == expected_ids
+
+
+async def test_tweet_feed_invalid_cursor(
+    client: AsyncClient, test_session: AsyncSession, second_user
+):
+
+    headers = {"api-key": "user"}
+    response = await client.get(
+        "/api/tweets", headers=headers, params={"cursor": "not-a-cursor"}
+    )
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+async def test_tweet_feed_cursor_out_of_range(
+    client: AsyncClient, test_session: AsyncSession, second_user
+):
+
+    headers = {"api-key": "user"}
+    for value in (2**31, -1):
+        response = await client.get(
+            "/api/tweets", headers=headers, params={"cursor": encode_cursor(value)}
+        )
+
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Invalid cursor"
@@ -1,9 +1,12 @@
 import io
 
+import pytest
 from httpx import AsyncClient
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from application import routes
+from application import media, routes
+from application.models import Media
 
 
 async def test_upload_media(
@@ -25,6 +28,7 @@ async def test_upload_media(
 
     assert len(created_files) == 1
     assert created_files[0].suffix == ".jpg"
+    assert created_files[0].read_bytes() == file_content
     assert response.status_code == 200
     assert isinstance(answer["media_id"], int)
 
@@ -38,3 +42,182 @@ async def test_not_file(client: AsyncClient, test_session: AsyncSession, first_u
     response = await client.post("/api/medias", files=files, headers=headers)
 
     assert response.status_code == 422
+
+
+async def test_upload_media_too_large(
+    client: AsyncClient, test_session: AsyncSession, tmp_path, monkeypatch, first_user
+):
+    test_media_dir = tmp_path / "test_media"
+    test_media_dir.mkdir()
+    monkeypatch.setattr(routes, "MEDIA_DIR", str(test_media_dir))
+    monkeypatch.setattr(media, "MEDIA_MAX_SIZE", 8)
+    monkeypatch.setattr(media, "MEDIA_CHUNK_SIZE", 4)
+
+    files = {"file": ("big.jpg", io.BytesIO(b"0123456789"), "image/jpeg")}
+    headers = {"api-key": first_user.api_key}
+
+    response = await client.post("/api/medias", files=files, headers=headers)
+
+    assert response.status_code == 413
+    assert list(test_media_dir.iterdir()) == []
+
+
+async def test_upload_rejected_before_parsing(
+    client: AsyncClient, tmp_path, monkeypatch, first_user
+):
+    monkeypatch.setattr(routes, "MEDIA_DIR", str(tmp_path))
+    monkeypatch.setattr(media, "MEDIA_MAX_SIZE", 8)
+    monkeypatch.setattr(media, "MULTIPART_OVERHEAD", 0)
+    stored = []
+    monkeypatch.setattr(routes, "store_upload", lambda *args: stored.append(args))
+
+    files = {"file": ("big.jpg", io.BytesIO(b"0123456789"), "image/jpeg")}
+    response = await client.post(
+        "/api/medias", files=files, headers={"api-key": first_user.api_key}
+    )
+
+    assert response.status_code == 413
+    assert stored == []
+
+
+async def test_chunked_upload_limited(
+    client: AsyncClient, tmp_path, monkeypatch, first_user
+):
+    monkeypatch.setattr(routes, "MEDIA_DIR", str(tmp_path))
+    monkeypatch.setattr(media, "MEDIA_MAX_SIZE", 8)
+    monkeypatch.setattr(media, "MULTIPART_OVERHEAD", 0)
+    stored = []
+    monkeypatch.setattr(routes, "store_upload", lambda *args: stored.append(args))
+
+    async def body():
+        # Без Content-Length: размер известен только по мере чтения
+        yield (
+            b'--b\r\nContent-Disposition: form-data; name="file"; '
+            b'filename="big.jpg"\r\nContent-Type: image/jpeg\r\n\r\n'
+        )
+        yield b"0123456789" * 10 + b"\r\n--b--\r\n"
+
+    response = await client.post(
+        "/api/medias",
+        content=body(),
+        headers={
+            "api-key": first_user.api_key,
+            "content-type": "multipart/form-data; boundary=b",
+        },
+    )
+
+    assert response.status_code == 413
+    assert stored == []
+
+
+async def test_content_addressed_media(
+    client: AsyncClient, test_session: AsyncSession, tmp_path, monkeypatch, first_user
+):
+    test_media_dir = tmp_path / "test_media"
+    test_media_dir.mkdir()
+    monkeypatch.setattr(routes, "MEDIA_DIR", str(test_media_dir))
+    monkeypatch.setattr(media, "MEDIA_STORAGE", "content")
+    headers = {"api-key": first_user.api_key}
+
+    tweet_ids = []
+    for _ in range(2):
+        files = {"file": ("meme.png", io.BytesIO(b"same-meme"), "image/png")}
+        response = await client.post("/api/medias", files=files, headers=headers)
+        media_id = response.json()["media_id"]
+        response = await client.post(
+            "/api/tweets",
+            json={"tweet_data": "meme", "tweet_media_ids": [media_id]},
+            headers=headers,
+        )
+        tweet_ids.append(response.json()["tweet_id"])
+
+    stored = [path for path in test_media_dir.rglob("*") if path.is_file()]
+    assert len(stored) == 1
+    assert stored[0].relative_to(test_media_dir).parts[:2] == (
+        stored[0].stem[:2],
+        stored[0].stem[2:4],
+    )
+
+    await client.delete(f"/api/tweets/{tweet_ids[0]}", headers=headers)
+    assert stored[0].exists()
+
+    await client.delete(f"/api/tweets/{tweet_ids[1]}", headers=headers)
+    assert not stored[0].exists()
+
+
+async def test_upload_media_batch(
+    client: AsyncClient,
+    test_session: AsyncSession,
+    tmp_path,
+    monkeypatch,
+    first_user,
+    query_budget,
+):
+    monkeypatch.setattr(routes, "MEDIA_DIR", str(tmp_path))
+    files = [
+        ("files", (f"image_{i}.jpg", io.BytesIO(f"image {i}".encode()), "image/jpeg"))
+        for i in range(4)
+    ]
+    headers = {"api-key": first_user.api_key}
+
+    # блокировка путей и один INSERT ... RETURNING, затем один UPDATE с размерами
+    # копий из фоновой задачи; SAVEPOINT и RELEASE — от транзакции теста
+    with query_budget(7):
+        response = await client.post("/api/medias/batch", files=files, headers=headers)
+
+    answer = response.json()
+    result = await test_session.execute(
+        select(Media.id, Media.path).where(Media.id.in_(answer["media_ids"]))
+    )
+    paths = dict(result.tuples().all())
+
+    assert response.status_code == 200
+    assert answer["result"] is True
+    assert len(answer["media_ids"]) == 4
+    for i, media_id in enumerate(answer["media_ids"]):
+        with open(paths[media_id], "rb") as stored:
+            assert stored.read() == f"image {i}".encode()
+
+
+async def test_upload_media_batch_insert_failure(
+    client: AsyncClient, test_session: AsyncSession, tmp_path, monkeypatch, first_user
+):
+    monkeypatch.setattr(routes, "MEDIA_DIR", str(tmp_path))
+
+    async def save_media_batch(session, rows, stored):
+        await media.publish(stored)
+        raise RuntimeError("insert failed")
+
+    monkeypatch.setattr(routes, "save_media_batch", save_media_batch)
+    files = [
+        ("files", (f"image_{i}.jpg", io.BytesIO(f"image {i}".encode()), "image/jpeg"))
+        for i in range(2)
+    ]
+
+    with pytest.raises(RuntimeError):
+        await client.post(
+            "/api/medias/batch", files=files, headers={"api-key": first_user.api_key}
+        )
+
+    assert [path for path in tmp_path.rglob("*") if path.is_file()] == []
+
+
+async def test_upload_media_batch_too_large(
+    client: AsyncClient, test_session: AsyncSession, tmp_path, monkeypatch, first_user
+):
+    monkeypatch.setattr(routes, "MEDIA_DIR", str(tmp_path))
+    monkeypatch.setattr(media, "MEDIA_MAX_SIZE", 8)
+    files = [
+        ("files", ("small.jpg", io.BytesIO(b"small"), "image/jpeg")),
+        ("files", ("big.jpg", io.BytesIO(b"0123456789"), "image/jpeg")),
+    ]
+    headers = {"api-key": first_user.api_key}
+
+    response = await client.post("/api/medias/batch", files=files, headers=headers)
+    result = await test_session.execute(
+        select(Media).where(Media.path.startswith(str(tmp_path)))
+    )
+
+    assert response.status_code == 413
+    assert list(tmp_path.iterdir()) == []
+    assert result.scalars().all() == []
@@ -0,0 +1,162 @@
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from application import media_gc, models, thumbnails
+
+HOUR = 3600
+
+
+def make_file(path, age: float = 0, data: bytes = b"image") -> str:
+    path.write_bytes(data)
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+    return str(path)
+
+
+async def test_collects_unattached_media(
+    test_session: AsyncSession, tmp_path, test_tweet_with_media
+):
+
+    old = datetime.now(timezone.utc) - timedelta(hours=2)
+    expired = models.Media(
+        path=make_file(tmp_path / "expired.jpg", 2 * HOUR), created_at=old
+    )
+    fresh = models.Media(path=make_file(tmp_path / "fresh.jpg"))
+    attached = models.Media(
+        path=make_file(tmp_path / "attached.jpg", 2 * HOUR),
+        created_at=old,
+        tweet_id=test_tweet_with_media.id,
+    )
+    test_session.add_all([expired, fresh, attached])
+    await test_session.flush()
+
+    report = await media_gc.collect_garbage(test_session, tmp_path, max_age=HOUR)
+
+    result = await test_session.execute(
+        select(models.Media.path).where(models.Media.path.startswith(str(tmp_path)))
+    )
+    assert sorted(result.scalars().all()) == sorted([fresh.path, attached.path])
+    assert not os.path.exists(expired.path)
+    assert report == media_gc.GcReport(rows=1, files=1, bytes=len(b"image"))
+
+
+async def test_collects_orphan_files(test_session: AsyncSession, tmp_path):
+
+    shard = tmp_path / "ab" / "cd"
+    shard.mkdir(parents=True)
+    orphan = make_file(shard / "orphan.jpg", 2 * HOUR, b"orphan")
+    partial = make_file(tmp_path / ".upload.part", 2 * HOUR)
+    uploading = make_file(tmp_path / "uploading.jpg")
+    known = make_file(tmp_path / "known.jpg", 2 * HOUR)
+    test_session.add(models.Media(path=known))
+    await test_session.flush()
+
+    report = await media_gc.collect_garbage(
+        test_session, tmp_path, max_age=HOUR, batch_size=1
+    )
+
+    assert not os.path.exists(orphan)
+    assert not os.path.exists(partial)
+    assert os.path.exists(uploading)
+    assert os.path.exists(known)
+    assert report.files == 2
+    assert report.bytes == len(b"orphan") + len(b"image")
+
+
+async def test_keeps_variants_of_known_originals(test_session: AsyncSession, tmp_path):
+
+    known = make_file(tmp_path / "known.jpg", 2 * HOUR)
+    kept = make_file(tmp_path / f"known.jpg.{320}.webp", 2 * HOUR)
+    stale = make_file(tmp_path / f"gone.jpg.{320}.webp", 2 * HOUR, b"webp")
+    test_session.add(models.Media(path=known))
+    await test_session.flush()
+
+    report = await media_gc.collect_garbage(test_session, tmp_path, max_age=HOUR)
+
+    assert kept == thumbnails.variant_path(known, 320)
+    assert os.path.exists(kept)
+    assert not os.path.exists(stale)
+    assert report.files == 1
+
+
+def test_cli_refuses_other_media_dir(monkeypatch, tmp_path):
+
+    calls = []
+    monkeypatch.setattr(media_gc, "collect_garbage", lambda *args: calls.append(args))
+    monkeypatch.setattr(sys, "argv", ["media_gc", "--media-dir", str(tmp_path)])
+
+    with pytest.raises(SystemExit):
+        media_gc.main()
+    assert calls == []
+
+
+def test_cli_resolves_media_dir(monkeypatch):
+
+    calls = []
+
+    async def collect_garbage(session, *args):
+        calls.append(args)
+        return media_gc.GcReport()
+
+    async def dispose_engines():
+        pass
+
+    monkeypatch.setattr(media_gc, "collect_garbage", collect_garbage)
+    monkeypatch.setattr(media_gc, "dispose_engines", dispose_engines)
+    monkeypatch.chdir(media_gc.MEDIA_DIR.parent)
+    monkeypatch.setattr(
+        sys, "argv", ["media_gc", "--media-dir", f"./{media_gc.MEDIA_DIR.name}"]
+    )
+
+    media_gc.main()
+
+    assert calls == [
+        (media_gc.MEDIA_DIR, media_gc.MEDIA_GC_MAX_AGE, media_gc.MEDIA_GC_BATCH)
+    ]
+
+
+async def test_orphans_found_through_symlink(test_session: AsyncSession, tmp_path):
+
+    real = tmp_path / "real"
+    real.mkdir()
+    link = tmp_path / "media"
+    link.symlink_to(real)
+    known = make_file(link / "known.jpg", 2 * HOUR)
+    test_session.add(models.Media(path=known))
+    await test_session.flush()
+
+    report = await media_gc.collect_garbage(test_session, link, max_age=HOUR)
+
+    assert os.path.exists(known)
+    assert report.files == 0
+
+
+async def test_orphan_check_holds_path_locks(
+    test_session: AsyncSession, tmp_path, monkeypatch
+):
+
+    orphan = make_file(tmp_path / "orphan.jpg", 2 * HOUR)
+    lock_paths = media_gc.lock_paths
+    locked = []
+
+    async def record_locks(session, paths):
+        locked.append(list(paths))
+        await lock_paths(session, paths)
+        # Загрузка тех же байтов успела вставить запись до блокировки
+        session.add(models.Media(path=orphan))
+        await session.flush()
+
+    monkeypatch.setattr(media_gc, "lock_paths", record_locks)
+
+    report = media_gc.GcReport()
+    await media_gc.collect_orphan_files(test_session, tmp_path, HOUR, 10, report)
+
+    assert locked == [[orphan]]
+    assert os.path.exists(orphan)
+    assert report.files == 0
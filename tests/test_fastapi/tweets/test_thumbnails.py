@@ -0,0 +1,92 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+from httpx import AsyncClient
+from PIL import Image
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from application import models, routes, thumbnails
+from application.crud.tweets import make_variants
+
+
+def png(width: int, height: int) -> bytes:
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), "orange").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+async def test_upload_renders_variants(
+    client: AsyncClient, test_session: AsyncSession, tmp_path, monkeypatch, first_user
+):
+
+    monkeypatch.setattr(routes, "MEDIA_DIR", str(tmp_path))
+    monkeypatch.setattr(thumbnails, "THUMBNAIL_SIZES", (320, 1080))
+
+    files = {"file": ("wide.png", io.BytesIO(png(1600, 800)), "image/png")}
+    response = await client.post(
+        "/api/medias", files=files, headers={"api-key": first_user.api_key}
+    )
+
+    assert response.status_code == 200
+    media = await test_session.get(models.Media, response.json()["media_id"])
+    assert media is not None
+    assert media.variants == [320, 1080]
+    variants = thumbnails.variant_urls(media.path, media.variants)
+    assert list(variants) == ["320", "1080"]
+    for size, expected in (("320", (320, 160)), ("1080", (1080, 540))):
+        with Image.open(variants[size]) as image:
+            assert image.format == "WEBP"
+            assert image.size == expected
+
+
+def test_render_skips_broken_images(tmp_path):
+
+    broken = tmp_path / "broken.jpg"
+    broken.write_bytes(b"not an image")
+
+    assert thumbnails.render_variants(str(broken), (320,), 80) == []
+    assert list(tmp_path.iterdir()) == [broken]
+
+
+async def test_failed_render_is_remembered(
+    test_session: AsyncSession, tmp_path, monkeypatch
+):
+
+    broken = tmp_path / "broken.jpg"
+    broken.write_bytes(b"not an image")
+    media = models.Media(path=str(broken))
+    test_session.add(media)
+    await test_session.flush()
+    renders = []
+    render_variants = thumbnails.render_variants
+
+    def render(*args):
+        renders.append(args)
+        return render_variants(*args)
+
+    # Пул потоков вместо процессов, чтобы посчитать вызовы
+    monkeypatch.setattr(thumbnails, "get_pool", lambda: ThreadPoolExecutor(1))
+    monkeypatch.setattr(thumbnails, "render_variants", render)
+    monkeypatch.setattr(thumbnails, "failed_renders", thumbnails.TTLCache(10, 60))
+
+    await make_variants(test_session, [media.path])
+    assert await thumbnails.generate_variants(media.path) == []
+
+    result = await test_session.execute(
+        select(models.Media.variants).where(models.Media.id == media.id)
+    )
+    assert result.scalar_one() == []
+    assert len(renders) == 1
+
+
+def test_variant_names():
+
+    path = "/media/ab/cd/abcd.jpg"
+
+    assert thumbnails.original_of(thumbnails.variant_path(path, 320)) == path
+    assert thumbnails.original_of(path) is None
+    assert thumbnails.variant_urls(path, None) == {}
+    assert thumbnails.variant_urls(path, [320]) == {"320": f"{path}.320.webp"}
+    assert thumbnails.with_variants(["/media/clip.mp4"]) == ["/media/clip.mp4"]
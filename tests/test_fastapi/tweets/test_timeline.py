@@ -0,0 +1,199 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from application import models, timeline
+
+
+@pytest.fixture
+def timeline_backend(monkeypatch):
+
+    backend = timeline.PostgresTimeline()
+    enqueued = []
+
+    async def fake_enqueue(task_name, *args):
+        enqueued.append((task_name, *args))
+
+    monkeypatch.setattr(timeline, "get_backend", lambda: backend)
+    monkeypatch.setattr(timeline, "enqueue", fake_enqueue)
+    backend.enqueued = enqueued  # type: ignore[attr-defined]
+
+    return backend
+
+
+async def test_fan_out_tweet(
+    test_session: AsyncSession,
+    timeline_backend,
+    first_user,
+    second_user,
+    test_tweet_with_media,
+):
+
+    await timeline.fan_out_tweet(
+        test_session, timeline_backend, test_tweet_with_media.id, first_user.id
+    )
+
+    follower_ids = await timeline_backend.range(test_session, second_user.id, 10)
+    author_ids = await timeline_backend.range(test_session, first_user.id, 10)
+
+    assert follower_ids == [test_tweet_with_media.id]
+    assert author_ids == []
+
+
+async def test_retract_follow(
+    test_session: AsyncSession,
+    timeline_backend,
+    first_user,
+    second_user,
+    test_tweet_with_media,
+):
+
+    await timeline.fan_out_tweet(
+        test_session, timeline_backend, test_tweet_with_media.id, first_user.id
+    )
+    await timeline.retract_follow(
+        test_session, timeline_backend, second_user.id, first_user.id
+    )
+
+    assert await timeline_backend.range(test_session, second_user.id, 10) == []
+
+
+async def test_celebrity_is_pulled(
+    client: AsyncClient,
+    test_session: AsyncSession,
+    monkeypatch,
+    timeline_backend,
+    first_user,
+    second_user,
+    test_tweet_with_media,
+):
+
+    monkeypatch.setattr(timeline, "CELEBRITY_FOLLOWER_THRESHOLD", 1)
+    await timeline.fan_out_tweet(
+        test_session, timeline_backend, test_tweet_with_media.id, first_user.id
+    )
+
+    response = await client.get("/api/tweets", headers={"api-key": "user"})
+
+    assert first_user.is_celebrity
+    assert await timeline_backend.range(test_session, second_user.id, 10) == []
+    assert [tweet["id"] for tweet in response.json()["tweets"]] == [
+        test_tweet_with_media.id
+    ]
+
+
+async def test_feed_reads_timeline(
+    client: AsyncClient,
+    test_session: AsyncSession,
+    timeline_backend,
+    first_user,
+    second_user,
+):
+
+    older = models.Tweet(user_id=first_user.id, tweet_data="before timeline")
+    test_session.add(older)
+    await test_session.flush()
+
+    headers = {"api-key": first_user.api_key}
+    response = await client.post(
+        "/api/tweets", json={"tweet_data": "fan out"}, headers=headers
+    )
+    tweet_id = response.json()["tweet_id"]
+    assert timeline_backend.enqueued == [("fan_out_tweet", tweet_id, first_user.id)]
+    await timeline.fan_out_tweet(
+        test_session, timeline_backend, tweet_id, first_user.id
+    )
+
+    headers = {"api-key": second_user.api_key}
+    response = await client.get("/api/tweets", headers=headers, params={"limit": 1})
+    first_page = response.json()
+    response = await client.get(
+        "/api/tweets",
+        headers=headers,
+        params={"limit": 1, "cursor": first_page["next_cursor"]},
+    )
+    second_page = response.json()
+
+    assert [tweet["id"] for tweet in first_page["tweets"]] == [tweet_id]
+    assert [tweet["id"] for tweet in second_page["tweets"]] == [older.id]
+
+
+async def test_backfill_after_pull_mode(
+    test_session: AsyncSession,
+    monkeypatch,
+    timeline_backend,
+    first_user,
+    second_user,
+):
+
+    pulled = models.Tweet(user_id=first_user.id, tweet_data="pull mode")
+    test_session.add(pulled)
+    await test_session.flush()
+    monkeypatch.setattr(timeline, "CELEBRITY_FOLLOWER_THRESHOLD", 1)
+    await timeline.fan_out_tweet(
+        test_session, timeline_backend, pulled.id, first_user.id
+    )
+
+    pushed = models.Tweet(user_id=first_user.id, tweet_data="push mode")
+    test_session.add(pushed)
+    await test_session.flush()
+    monkeypatch.setattr(timeline, "CELEBRITY_FOLLOWER_THRESHOLD", 100)
+    await timeline.fan_out_tweet(
+        test_session, timeline_backend, pushed.id, first_user.id
+    )
+
+    assert not first_user.is_celebrity
+    assert await timeline_backend.range(test_session, second_user.id, 10) == [
+        pushed.id,
+        pulled.id,
+    ]
+
+
+async def test_feed_skips_deleted_timeline_ids(
+    client: AsyncClient,
+    test_session: AsyncSession,
+    monkeypatch,
+    test_redis,
+    first_user,
+    second_user,
+):
+
+    backend = timeline.RedisTimeline(test_redis)
+    monkeypatch.setattr(timeline, "get_backend", lambda: backend)
+    tweets = [
+        models.Tweet(user_id=first_user.id, tweet_data=f"tweet {i}") for i in range(2)
+    ]
+    test_session.add_all(tweets)
+    await test_session.flush()
+    # Твит удален, а retract_tweet еще не дошел до ленты
+    deleted_id = tweets[-1].id + 1000
+    await backend.add(
+        test_session, [second_user.id], [tweet.id for tweet in tweets] + [deleted_id]
+    )
+
+    response = await client.get(
+        "/api/tweets", headers={"api-key": "user"}, params={"limit": 1}
+    )
+    page = response.json()
+
+    assert [tweet["id"] for tweet in page["tweets"]] == [tweets[-1].id]
+    assert page["next_cursor"] is not None
+
+
+async def test_postgres_timeline_trimmed(
+    test_session: AsyncSession, first_user, second_user
+):
+
+    backend = timeline.PostgresTimeline(max_length=2)
+    tweets = [
+        models.Tweet(user_id=first_user.id, tweet_data=f"tweet {i}") for i in range(4)
+    ]
+    test_session.add_all(tweets)
+    await test_session.flush()
+    tweet_ids = [tweet.id for tweet in tweets]
+
+    await backend.add(test_session, [second_user.id], tweet_ids[:3])
+    await backend.add(test_session, [first_user.id, second_user.id], tweet_ids[3:])
+
+    assert await backend.range(test_session, second_user.id, 10) == tweet_ids[:1:-1]
+    assert await backend.range(test_session, first_user.id, 10) == tweet_ids[3:]
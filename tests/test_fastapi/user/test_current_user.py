@@ -2,6 +2,7 @@ import pytest
 from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from application.auth import auth_cache
 from application.routes import get_current_user
 
 
@@ -23,3 +24,27 @@ async def test_invalid_api_key(test_session: AsyncSession, first_user):
 
     assert exc_info.value.status_code == 401
     assert exc_info.value.detail == "User not found"
+
+
+async def test_current_user_cached(test_session: AsyncSession, first_user):
+
+    api_key = first_user.api_key
+
+    await get_current_user(api_key=api_key, session=test_session)
+    hits = auth_cache.hits
+    user = await get_current_user(api_key=api_key, session=test_session)
+
+    assert auth_cache.hits == hits + 1
+    assert user.id == first_user.id
+    assert user.name == first_user.name
+
+
+async def test_current_user_cache_invalidated(test_session: AsyncSession, first_user):
+
+    await get_current_user(api_key=first_user.api_key, session=test_session)
+
+    first_user.name = "renamed"
+    await test_session.flush()
+    user = await get_current_user(api_key=first_user.api_key, session=test_session)
+
+    assert user.name == "renamed"
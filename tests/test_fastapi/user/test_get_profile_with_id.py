@@ -1,6 +1,8 @@
 from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from application import models, routes
+
 
 async def test_get_profile_id(
     client: AsyncClient, test_session: AsyncSession, first_user, second_user
@@ -16,7 +18,46 @@ async def test_get_profile_id(
             "name": second_user.name,
             "followers": [],
             "following": [{"id": first_user.id, "name": first_user.name}],
+            "followers_count": 0,
+            "following_count": 1,
+            "followers_cursor": None,
+            "following_cursor": None,
         },
     }
     assert response.status_code == 200
     assert response.json() == answer
+
+
+async def test_followers_pages(
+    client: AsyncClient, test_session: AsyncSession, monkeypatch, first_user
+):
+
+    followers = [models.User(api_key=f"key{i}", name=f"follower{i}") for i in range(3)]
+    test_session.add_all(followers)
+    await test_session.flush()
+    test_session.add_all(
+        models.FollowLink(follower_id=user.id, followed_id=first_user.id)
+        for user in followers
+    )
+    first_user.followers_count = len(followers)
+    await test_session.flush()
+    monkeypatch.setattr(routes, "PROFILE_PAGE_SIZE", 2)
+
+    headers = {"api-key": first_user.api_key}
+    response = await client.get(f"/api/users/{first_user.id}", headers=headers)
+    profile = response.json()["user"]
+
+    response = await client.get(
+        f"/api/users/{first_user.id}/followers",
+        headers=headers,
+        params={"cursor": profile["followers_cursor"]},
+    )
+    rest = response.json()
+
+    assert profile["followers_count"] == 3
+    assert [user["id"] for user in profile["followers"]] == [
+        user.id for user in followers[:2]
+    ]
+    assert response.status_code == 200
+    assert rest["users"] == [{"id": followers[2].id, "name": followers[2].name}]
+    assert rest["next_cursor"] is None
@@ -2,15 +2,23 @@ from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
-async def test_users_me(client: AsyncClient, test_session: AsyncSession, first_user):
+async def test_users_me(
+    client: AsyncClient, test_session: AsyncSession, first_user, query_budget
+):
     headers = {"api-key": first_user.api_key}
-    response = await client.get("/api/users/me", headers=headers)
+    # пользователь по api_key, профиль, страницы подписчиков и подписок
+    with query_budget(4):
+        response = await client.get("/api/users/me", headers=headers)
 
     info_user = {
         "result": True,
         "user": {
             "followers": [],
             "following": [],
+            "followers_count": 0,
+            "following_count": 0,
+            "followers_cursor": None,
+            "following_cursor": None,
             "id": first_user.id,
             "name": first_user.name,
         },